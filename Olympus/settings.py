@@ -47,15 +47,18 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        # JWT 放在首位：只校验签名和注销列表，不查询数据库
+        'Themis.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
 
 MIDDLEWARE = [
+    # 放在最外层，计时覆盖其余中间件
+    'Themis.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -90,12 +93,79 @@ WSGI_APPLICATION = 'Olympus.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# 数据库由环境变量选择：DB_ENGINE=sqlite（默认）或 postgresql
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+# 持久连接的秒数，0 表示每个请求重新建立连接
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'olympus'),
+            'USER': os.environ.get('DB_USER', 'olympus'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # 复用连接前先检查其是否仍然可用
+            'CONN_HEALTH_CHECKS': True,
+            # 经 PgBouncer 事务级连接池访问时，服务端游标无法跨事务使用
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # 测试库使用文件而非共享内存库，多线程测试才能正常加锁等待
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+
+# 每个 SQLite 连接建立时执行的 PRAGMA（见 Themis.signals.configure_sqlite），DB_SQLITE_TUNING=0 时保持默认
+# WAL 模式下读写互不阻塞，synchronous=NORMAL 在 WAL 下仍能保证崩溃后数据库一致
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+} if os.environ.get('DB_SQLITE_TUNING', '1') != '0' else {}
+
+# 共享缓存：默认本进程内存，CACHE_BACKEND=file 时多进程共用一个目录，CACHE_BACKEND=redis 时使用 CACHE_LOCATION 的 Redis
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', '/var/tmp/olympus_cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'olympus',
+        }
+    }
+
+# 参考数据表（区域、职级、项目类型/状态、客户）的进程内副本与共享版本号核对的间隔秒数，见 Themis.reference
+REFERENCE_CACHE_CHECK_INTERVAL = float(os.environ.get('REFERENCE_CACHE_CHECK_INTERVAL', 1))
+
+# 允许抓取 /metrics 的客户端地址，逗号分隔；监控直接抓取各个进程，不经过反向代理
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -5,3 +5,6 @@ class ThemisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
 
     name = 'Themis'
+
+    def ready(self):
+        from Themis import signals  # noqa: F401
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.functional import cached_property
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from Themis.models import Employee, RevokedToken
+
+# 完整 Employee 对象在进程内缓存的秒数
+USER_CACHE_TTL = getattr(settings, 'JWT_USER_CACHE_TTL', 30)
+# 进程内最多缓存的 Employee 个数，超出后淘汰最久未使用的
+USER_CACHE_SIZE = getattr(settings, 'JWT_USER_CACHE_SIZE', 1000)
+# 注销列表从数据库同步的间隔秒数
+REVOCATION_SYNC_INTERVAL = getattr(settings, 'JWT_REVOCATION_SYNC_INTERVAL', 30)
+
+
+class RevocationList:
+    """
+    In-process copy of the revoked token ids and deactivated employees, reloaded from the database at most once per
+    ``interval`` seconds so checking a token costs two set lookups.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.jtis = frozenset()
+        self.user_ids = frozenset()
+        self.synced_at = None
+        self._lock = threading.Lock()
+
+    def due(self):
+        return self.synced_at is None or time.monotonic() - self.synced_at >= self.interval
+
+    def sync(self, force=False):
+        if not force and not self.due():
+            return
+        with self._lock:
+            if not force and not self.due():
+                return
+            now = datetime.now(timezone.utc)
+            self.jtis = frozenset(RevokedToken.objects.filter(expires_at__gt=now).values_list('jti', flat=True))
+            # 令牌中的 user_id 是字符串
+            self.user_ids = frozenset(str(pk) for pk in Employee.objects.filter(is_active=False)
+                                      .values_list('pk', flat=True))
+            self.synced_at = time.monotonic()
+
+    def is_revoked(self, token):
+        self.sync()
+        return (token.get(api_settings.JTI_CLAIM) in self.jtis
+                or str(token.get(api_settings.USER_ID_CLAIM)) in self.user_ids)
+
+    def revoke(self, token, employee_id=None):
+        jti = token[api_settings.JTI_CLAIM]
+        RevokedToken.objects.get_or_create(jti=jti, defaults={
+            'employee_id': employee_id,
+            'expires_at': datetime.fromtimestamp(token['exp'], timezone.utc),
+        })
+        with self._lock:
+            self.jtis = self.jtis | {jti}
+
+
+revocation_list = RevocationList(REVOCATION_SYNC_INTERVAL)
+
+_employees = OrderedDict()
+_employees_lock = threading.Lock()
+
+
+def cached_employee(employee_id):
+    """
+    The full ``Employee`` row, cached in process for ``USER_CACHE_TTL`` seconds. At most ``USER_CACHE_SIZE`` rows
+    are kept, least recently used first out.
+    """
+    now = time.monotonic()
+    with _employees_lock:
+        entry = _employees.pop(employee_id, None)
+        if entry and entry[0] > now:
+            _employees[employee_id] = entry
+            return entry[1]
+    employee = Employee.objects.select_related('position').get(pk=employee_id)
+    with _employees_lock:
+        _employees.pop(employee_id, None)
+        _employees[employee_id] = (now + USER_CACHE_TTL, employee)
+        while len(_employees) > USER_CACHE_SIZE:
+            _employees.popitem(last=False)
+    return employee
+
+
+class ClaimsUser(TokenUser):
+    """
+    User built from the claims ``LoginSerializer`` signs into the token. Handlers that need the model instance use
+    ``employee``.
+    """
+
+    @cached_property
+    def info(self):
+        return self.token.get('user') or {}
+
+    @cached_property
+    def name(self):
+        return self.info.get('name')
+
+    @cached_property
+    def email(self):
+        return self.info.get('email')
+
+    @cached_property
+    def employee(self):
+        return cached_employee(self.id)
+
+    def __str__(self):
+        return f'{self.name}-{self.id}'
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication without a database lookup: a signature check plus the in-memory revocation list."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if revocation_list.is_revoked(token):
+            raise InvalidToken('Token has been revoked')
+        return token
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return ClaimsUser(validated_token)
+
+
+async def authenticate_async(request):
+    """
+    The ``DEFAULT_AUTHENTICATION_CLASSES`` of DRF for async views, which DRF cannot serve. A Bearer token is checked
+    by ``StatelessJWTAuthentication`` on the event loop; other credentials (session, DRF token) go through the
+    remaining classes in a thread, as DRF would run them. Returns the user, or None without credentials; raises
+    ``APIException`` for bad ones.
+    """
+    authentication = StatelessJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return await sync_to_async(authenticate_fallback)(request)
+    # 注销列表到期时在线程中同步，校验本身只做签名和集合查找
+    if revocation_list.due():
+        await sync_to_async(revocation_list.sync)()
+    return authentication.get_user(authentication.get_validated_token(raw_token))
+
+
+def authenticate_fallback(request):
+    authenticators = [authenticator() for authenticator in drf_settings.DEFAULT_AUTHENTICATION_CLASSES
+                      if not issubclass(authenticator, JWTAuthentication)]
+    # 会话认证在这里同样执行 CSRF 校验
+    user = Request(request, authenticators=authenticators).user
+    return user if user.is_authenticated else None
+
+
+def authentication_required(view):
+    """Authenticates an async view like a DRF view and sets ``request.user``; answers 401/403 like DRF."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await authenticate_async(request)
+        except APIException as e:
+            detail = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+            return JsonResponse(detail, status=e.status_code)
+        if user is None:
+            response = JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                                    status=status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = StatelessJWTAuthentication().authenticate_header(request)
+            return response
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,223 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.validators import UniqueValidator
+
+from Themis.reference import reference_table
+
+# 单次批量请求允许的最大条目数
+BATCH_MAX_ITEMS = getattr(settings, 'BATCH_MAX_ITEMS', 1000)
+BATCH_SIZE = 500
+
+
+def relation_fields(serializer):
+    """Writable primary key relations of ``serializer`` as (field name, relation, many) triples."""
+    for name, field in serializer.fields.items():
+        if field.read_only:
+            continue
+        many = isinstance(field, serializers.ManyRelatedField)
+        relation = field.child_relation if many else field
+        if isinstance(relation, serializers.PrimaryKeyRelatedField) and relation.pk_field is None:
+            yield name, relation, many
+
+
+def preload_related(serializer, items):
+    """
+    Loads every object referenced by ``items`` with one query per related model, e.g. ``DRI`` and ``allocator``
+    share a single employee query. Reference tables are already in memory and are skipped.
+    """
+    wanted = {}
+    for name, relation, many in relation_fields(serializer):
+        model = relation.get_queryset().model
+        if reference_table(model):
+            continue
+        ids = wanted.setdefault(model, set())
+        for item in items:
+            if not isinstance(item, dict) or item.get(name) is None:
+                continue
+            for value in (item[name] if many and isinstance(item[name], list) else [item[name]]):
+                pk = as_pk(value)
+                if pk is not None:
+                    ids.add(pk)
+    return {model: model._default_manager.in_bulk(ids) if ids else {} for model, ids in wanted.items()}
+
+
+def as_pk(value):
+    """``value`` as an integer primary key the way DRF accepts it (``12`` or ``"12"``), otherwise None."""
+    if isinstance(value, (int, str)) and not isinstance(value, bool) and str(value).isdigit():
+        return int(value)
+    return None
+
+
+def unique_fields(serializer):
+    """Drops the per-item ``UniqueValidator`` queries of ``serializer`` and returns the names of the fields."""
+    names = []
+    for name, field in serializer.fields.items():
+        validators = [validator for validator in field.validators if not isinstance(validator, UniqueValidator)]
+        if len(validators) != len(field.validators):
+            field.validators = validators
+            names.append(name)
+    return names
+
+
+def check_unique(model, name, values, errors):
+    """
+    Checks one unique field for every item with a single query. ``values`` maps item index to (pk, value); an
+    item fails if another row already has the value or an earlier item of the batch claims it.
+    """
+    values = {index: (pk, value) for index, (pk, value) in values.items() if value is not None}
+    if not values:
+        return
+    existing = dict(model._default_manager.filter(**{f'{name}__in': {value for _, value in values.values()}})
+                    .values_list(name, 'pk'))
+    message = f'{model._meta.verbose_name} with this {model._meta.get_field(name).verbose_name} already exists.'
+    seen = set()
+    for index, (pk, value) in sorted(values.items()):
+        if existing.get(value, pk) != pk or value in seen:
+            errors.setdefault(index, {}).setdefault(name, []).append(message)
+        seen.add(value)
+
+
+def write_batch(serializer_class, items, context, partial=False, atomic=False, after_write=None):
+    """
+    Creates (or with ``partial`` updates, by ``id``) every item of ``items`` through ``serializer_class``.
+
+    All items are validated together: related ids are checked against objects preloaded with one query per model
+    and unique fields with one query per field, then the valid items are written with ``bulk_create`` or grouped
+    ``bulk_update`` calls in one transaction. With ``atomic`` nothing is written unless every item is valid.
+    ``after_write(created, updated)`` replaces the model signals that bulk writes skip; ``updated`` holds
+    (instance, changed fields, previous values) triples.
+
+    Returns (results, status) where ``results`` has one ``{'index', 'status', 'id' | 'errors'}`` entry per item.
+    """
+    model = serializer_class.Meta.model
+    blank = serializer_class(context=context)
+    context = {**context, 'preloaded': preload_related(blank, items)}
+    instances = {}
+    if partial:
+        ids = [as_pk(item.get('id')) for item in items if isinstance(item, dict)]
+        instances = model._default_manager.in_bulk([pk for pk in ids if pk is not None])
+
+    errors, missing, valid = {}, set(), {}
+    unique = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = {'non_field_errors': ['Expected an object.']}
+            continue
+        instance = None
+        if partial:
+            instance = instances.get(as_pk(item.get('id')))
+            if instance is None:
+                missing.add(index)
+                errors[index] = {'id': ['Not found.']}
+                continue
+        serializer = serializer_class(instance, data=item, partial=partial, context=context)
+        for name in unique_fields(serializer):
+            unique.setdefault(name, {})
+        if serializer.is_valid():
+            valid[index] = serializer
+        else:
+            errors[index] = serializer.errors
+    for name, values in unique.items():
+        source = blank.fields[name].source
+        for index, serializer in valid.items():
+            if source in serializer.validated_data:
+                values[index] = (serializer.instance.pk if serializer.instance else None,
+                                 serializer.validated_data[source])
+        check_unique(model, source, values, errors)
+    valid = {index: serializer for index, serializer in valid.items() if index not in errors}
+
+    if atomic and errors:
+        return [result(index, errors, missing) for index in range(len(items))], status.HTTP_400_BAD_REQUEST
+    try:
+        with transaction.atomic():
+            created = create(model, [serializer for serializer in valid.values() if serializer.instance is None])
+            updated = update(model, [serializer for serializer in valid.values() if serializer.instance is not None])
+            if after_write:
+                after_write(created, updated)
+    except IntegrityError as e:
+        # 校验之后被并发写入抢先，整批回滚
+        for index in valid:
+            errors[index] = {'non_field_errors': [str(e)]}
+        valid = {}
+    ids = {index: serializer.instance.pk for index, serializer in valid.items()}
+    results = [result(index, errors, missing, ids.get(index), partial) for index in range(len(items))]
+    if errors:
+        return results, status.HTTP_207_MULTI_STATUS if valid else status.HTTP_400_BAD_REQUEST
+    return results, status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+
+
+def result(index, errors, missing, pk=None, partial=False):
+    if index in errors:
+        code = status.HTTP_404_NOT_FOUND if index in missing else status.HTTP_400_BAD_REQUEST
+        return {'index': index, 'status': code, 'errors': errors[index]}
+    if pk is None:
+        # 全有或全无模式下，其他条目校验失败导致未写入
+        return {'index': index, 'status': status.HTTP_424_FAILED_DEPENDENCY}
+    return {'index': index, 'status': status.HTTP_200_OK if partial else status.HTTP_201_CREATED, 'id': pk}
+
+
+def split_many(model, data):
+    many = {field.name for field in model._meta.many_to_many}
+    return {name: data.pop(name) for name in list(data) if name in many}
+
+
+def create(model, valid):
+    objects, relations = [], []
+    for serializer in valid:
+        data = dict(serializer.validated_data)
+        relations.append(split_many(model, data))
+        serializer.instance = model(**data)
+        objects.append(serializer.instance)
+    model._default_manager.bulk_create(objects, batch_size=BATCH_SIZE)
+    write_relations(model, zip(objects, relations))
+    return objects
+
+
+def write_relations(model, relations, replace=False):
+    """
+    Writes the many-to-many values of (instance, {field name: related objects}) pairs with one ``bulk_create`` of
+    the through rows per field; with ``replace`` the existing rows of those instances are deleted first, like
+    ``set()``. ``m2m_changed`` is not sent.
+    """
+    relations = list(relations)
+    for field in model._meta.many_to_many:
+        values = {instance.pk: {related.pk for related in many[field.name]}
+                  for instance, many in relations if field.name in many}
+        if not values:
+            continue
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        if replace:
+            through.objects.filter(**{f'{source}_id__in': list(values)}).delete()
+        rows = [through(**{f'{source}_id': pk, f'{target}_id': related}) for pk, related_pks in values.items()
+                for related in related_pks]
+        if rows:
+            through.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def update(model, valid):
+    now = timezone.now()
+    stamped = any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+    groups, updated, relations = {}, [], []
+    for serializer in valid:
+        instance, data = serializer.instance, dict(serializer.validated_data)
+        many = split_many(model, data)
+        previous = {name: getattr(instance, model._meta.get_field(name).attname) for name in data}
+        for name, value in data.items():
+            setattr(instance, name, value)
+        fields = tuple(sorted(data))
+        if stamped and (data or many):
+            # bulk_update 不会应用 auto_now；只改多对多关系时也要更新时间戳，否则 ETag 不变
+            instance.updated_at = now
+            fields += ('updated_at',)
+        if fields:
+            groups.setdefault(fields, []).append(instance)
+        relations.append((instance, many))
+        updated.append((instance, set(data) | set(many), previous))
+    # 按变更字段分组，每组只更新实际提交的列
+    for fields, objects in groups.items():
+        model._default_manager.bulk_update(objects, fields, batch_size=BATCH_SIZE)
+    write_relations(model, relations, replace=True)
+    return updated
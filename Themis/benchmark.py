@@ -0,0 +1,30 @@
+import subprocess
+
+from django.conf import settings
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))]
+
+
+def latency_summary(seconds):
+    """p50/p95/p99, mean and max of ``seconds`` in milliseconds."""
+    latencies = sorted(value * 1000 for value in seconds)
+    return {
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'mean': sum(latencies) / len(latencies) if latencies else None,
+        'max': latencies[-1] if latencies else None,
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
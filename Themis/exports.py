@@ -0,0 +1,266 @@
+import csv
+import datetime
+import decimal
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from Themis.models import Employee, Project, Task
+
+# 每次从数据库游标取出的行数
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+# 每次向客户端发送的行数
+ROWS_PER_CHUNK = 500
+
+# 每种导出的 (表头, values_list 查找路径)，关联名称通过 JOIN 在同一条查询中取出
+EXPORTS = {
+    'employees': (Employee, (
+        ('ID', 'id'),
+        ('工号', 'employee_number'),
+        ('姓名', 'name'),
+        ('用户名', 'username'),
+        ('区域', 'position__department__area__OA_name'),
+        ('部门', 'position__department__department'),
+        ('职位', 'position__title'),
+        ('序列', 'position_level__type'),
+        ('职级', 'position_level__level'),
+        ('状态', 'status'),
+        ('性别', 'gender'),
+        ('电话', 'phone'),
+        ('邮箱', 'email'),
+        ('入职时间', 'date_joined'),
+        ('工作地', 'work_place'),
+        ('合同签订地', 'contract_place'),
+        ('合同开始', 'contract_start_date'),
+        ('合同结束', 'contract_end_date'),
+        ('续签次数', 'contract_renewed_times'),
+        ('毕业院校', 'graduated_from'),
+        ('学历', 'degree'),
+        ('专长', 'expertise'),
+    )),
+    'projects': (Project, (
+        ('ID', 'id'),
+        ('项目编号', 'code'),
+        ('项目名称', 'name'),
+        ('区域', 'area__OA_name'),
+        ('项目经理', 'PM__name'),
+        ('商务经理', 'BM__name'),
+        ('项目类型', 'type__type'),
+        ('项目节点', 'status__status'),
+        ('客户', 'customer__name'),
+        ('立项日期', 'initiation_date'),
+        ('预计验收日期', 'completion_date_est'),
+    )),
+    'tasks': (Task, (
+        ('ID', 'id'),
+        ('项目编号', 'project__code'),
+        ('项目名称', 'project__name'),
+        ('任务', 'title'),
+        ('状态', 'status'),
+        ('优先级', 'priority'),
+        ('负责人', 'DRI__name'),
+        ('分配人', 'allocator__name'),
+        ('截止时间', 'deadline'),
+        ('完成时间', 'completed_time'),
+        ('创建时间', 'created_time'),
+        ('标签', 'tag'),
+        ('上级任务', 'parent_task_id'),
+    )),
+}
+
+
+def export_rows(name, queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Returns the header and a lazy iterator over the rows of export ``name``, read from ``queryset`` (all rows by
+    default) with a server-side cursor in chunks of ``chunk_size``, so memory does not grow with the row count.
+    """
+    model, columns = EXPORTS[name]
+    if queryset is None:
+        queryset = model.objects.all()
+    header = [title for title, _ in columns]
+    rows = queryset.order_by('id').values_list(*(lookup for _, lookup in columns)).iterator(chunk_size=chunk_size)
+    return header, rows
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value, for feeding ``csv.writer`` output to a generator."""
+
+    def write(self, value):
+        return value
+
+
+# Excel 会把以这些字符开头的单元格当作公式执行
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def csv_chunks(header, rows):
+    writer = csv.writer(Echo())
+    # 带 BOM，Excel 才能正确识别 UTF-8 中文
+    yield ('\ufeff' + writer.writerow(header)).encode()
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(map(csv_cell, row)))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode()
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'),
+    # 样式 1 为日期，样式 2 为日期时间
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="3"><xf/><xf numFmtId="14" applyNumberFormat="1"/>'
+        '<xf numFmtId="164" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'),
+}
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+# XML 1.0 不允许的控制字符
+ILLEGAL_XML_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime.datetime):
+        # Excel 不支持带时区的时间，转为本地时间
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        return f'<c s="2"><v>{(value - EXCEL_EPOCH) / datetime.timedelta(days=1)}</v></c>'
+    if isinstance(value, datetime.date):
+        return f'<c s="1"><v>{(value - EXCEL_EPOCH.date()).days}</v></c>'
+    text = escape(ILLEGAL_XML_CHARACTERS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class ZipSink:
+    """Write-only target for ``zipfile`` that hands out what has been written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def xlsx_chunks(header, rows):
+    """
+    Streams a single-sheet XLSX workbook. The sheet XML is compressed into the zip as the rows arrive and the
+    compressed bytes are yielded every ``ROWS_PER_CHUNK`` rows, so neither the sheet nor the file is held in
+    memory. Strings are written inline, which avoids a shared string table that would have to be built up front.
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            chunk = [f'<row>{"".join(map(xlsx_cell, header))}</row>']
+            for row in rows:
+                chunk.append(f'<row>{"".join(map(xlsx_cell, row))}</row>')
+                if len(chunk) >= ROWS_PER_CHUNK:
+                    sheet.write(''.join(chunk).encode())
+                    chunk = []
+                    yield sink.pop()
+            sheet.write(''.join(chunk).encode() + b'</sheetData></worksheet>')
+    yield sink.pop()
+
+
+EXPORT_WRITERS = {
+    'csv': (csv_chunks, 'text/csv; charset=utf-8'),
+    'xlsx': (xlsx_chunks, XLSX_CONTENT_TYPE),
+}
+
+
+async def async_chunks(chunks):
+    """
+    Async iterator over the generator ``chunks``. Under ASGI Django reads a sync streaming body with
+    ``sync_to_async(list)`` before sending it, which would hold the whole file in memory, so each chunk is produced
+    by its own ``sync_to_async`` call on the thread that owns the database cursor instead.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def export_response(name, file_format, queryset=None, chunk_size=EXPORT_CHUNK_SIZE, asynchronous=False):
+    """Streams export ``name``; pass ``asynchronous`` when serving under ASGI."""
+    header, rows = export_rows(name, queryset, chunk_size)
+    writer, content_type = EXPORT_WRITERS[file_format]
+    chunks = writer(header, rows)
+    if asynchronous:
+        chunks = async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{name}-{timezone.localdate():%Y%m%d}.{file_format}"'
+    return response
@@ -0,0 +1,62 @@
+from django.db import transaction
+
+from Themis.models import Project, ProjectMembership, Task
+
+ROLES = ProjectMembership.ROLE_CHOICES
+
+
+def _ensure(rows):
+    ProjectMembership.objects.bulk_create(
+        [ProjectMembership(employee_id=employee_id, project_id=project_id, role=role)
+         for employee_id, project_id, role in rows], ignore_conflicts=True)
+
+
+def sync_manager_roles(project):
+    """Keeps the PM/BM memberships of ``project`` in line with its PM and BM."""
+    for role, employee_id in ((ROLES.PM, project.PM_id), (ROLES.BM, project.BM_id)):
+        ProjectMembership.objects.filter(project=project, role=role).exclude(employee_id=employee_id).delete()
+        if employee_id:
+            _ensure([(employee_id, project.pk, role)])
+
+
+def sync_watchers(project_ids, employee_ids, added):
+    if added:
+        _ensure([(employee_id, project_id, ROLES.WATCHER) for project_id in project_ids for employee_id in employee_ids])
+    else:
+        ProjectMembership.objects.filter(project_id__in=project_ids, employee_id__in=employee_ids,
+                                         role=ROLES.WATCHER).delete()
+
+
+def sync_dri_roles(project_ids):
+    """Recomputes the DRI memberships of the given projects from their tasks."""
+    project_ids = [project_id for project_id in project_ids if project_id]
+    if not project_ids:
+        return
+    current = set(Task.objects.filter(project_id__in=project_ids, DRI__isnull=False)
+                  .values_list('DRI_id', 'project_id').distinct())
+    stored = ProjectMembership.objects.filter(project_id__in=project_ids, role=ROLES.DRI)
+    stale = [pk for pk, employee_id, project_id in stored.values_list('pk', 'employee_id', 'project_id')
+             if (employee_id, project_id) not in current]
+    if stale:
+        ProjectMembership.objects.filter(pk__in=stale).delete()
+    _ensure([(employee_id, project_id, ROLES.DRI) for employee_id, project_id in current])
+
+
+def rebuild_memberships(batch_size=1000):
+    """Rebuilds the whole index, e.g. after bulk writes that bypass signals."""
+    rows = set()
+    for project_id, pm_id, bm_id in Project.objects.values_list('id', 'PM_id', 'BM_id').iterator():
+        if pm_id:
+            rows.add((pm_id, project_id, ROLES.PM))
+        if bm_id:
+            rows.add((bm_id, project_id, ROLES.BM))
+    watchers = Project.watched_by.through.objects.values_list('employee_id', 'project_id')
+    rows.update((employee_id, project_id, ROLES.WATCHER) for employee_id, project_id in watchers.iterator())
+    tasks = Task.objects.filter(DRI__isnull=False).values_list('DRI_id', 'project_id').distinct()
+    rows.update((employee_id, project_id, ROLES.DRI) for employee_id, project_id in tasks.iterator())
+    with transaction.atomic():
+        ProjectMembership.objects.all().delete()
+        ProjectMembership.objects.bulk_create(
+            [ProjectMembership(employee_id=employee_id, project_id=project_id, role=role)
+             for employee_id, project_id, role in rows], batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (64, 256)
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                               thread_name_prefix='thumbnails')
+# 正在生成缩略图的文件，避免同一图片被重复提交
+_pending = set()
+_pending_lock = threading.Lock()
+# 缺失的缩略图在该秒数内不再查询存储，其他进程生成的缩略图至多延迟这么久才会用上
+THUMBNAIL_MISS_TTL = getattr(settings, 'THUMBNAIL_MISS_TTL', 60)
+# 已确认存在的缩略图；文件按内容哈希命名，生成后不会再变化
+_existing = set()
+# 缺失的缩略图到下次查询存储的时间
+_missing = {}
+
+
+def store_upload(uploaded_file, upload_to):
+    """
+    Saves ``uploaded_file`` under ``upload_to`` named by the SHA-256 of its content and returns the storage name.
+    Identical uploads resolve to the same name, so the file is only written once.
+    """
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    name = f'{upload_to}{digest.hexdigest()}{extension}'
+    if not default_storage.exists(name):
+        uploaded_file.seek(0)
+        saved = default_storage.save(name, uploaded_file)
+        if saved != name and default_storage.exists(name):
+            # 并发的相同上传已先写入，存储另起了带后缀的文件名；内容相同，保留按哈希命名的那份
+            default_storage.delete(saved)
+        else:
+            name = saved
+    return name
+
+
+def thumbnail_name(name, size):
+    directory, filename = os.path.split(name)
+    return f'{directory}/thumbs/{os.path.splitext(filename)[0]}_{size}.webp'
+
+
+def thumbnail_exists(name, size):
+    """
+    Whether the ``size`` thumbnail of ``name`` has been generated. Found thumbnails are remembered for good and
+    missing ones for ``THUMBNAIL_MISS_TTL`` seconds, so listing many rows does not query the storage per row.
+    """
+    thumbnail = thumbnail_name(name, size)
+    if thumbnail in _existing:
+        return True
+    now = time.monotonic()
+    if _missing.get(thumbnail, 0) > now:
+        return False
+    if default_storage.exists(thumbnail):
+        _existing.add(thumbnail)
+        _missing.pop(thumbnail, None)
+        return True
+    _missing[thumbnail] = now + THUMBNAIL_MISS_TTL
+    return False
+
+
+def schedule_thumbnails(name):
+    """
+    Generates the thumbnails of ``name`` on the background pool. Returns the future, or None when the image is
+    already queued.
+    """
+    with _pending_lock:
+        if name in _pending:
+            return None
+        _pending.add(name)
+    future = _executor.submit(generate_thumbnails, name)
+    future.add_done_callback(lambda _: _finish(name))
+    return future
+
+
+def _finish(name):
+    with _pending_lock:
+        _pending.discard(name)
+
+
+def generate_thumbnails(name):
+    missing = [size for size in THUMBNAIL_SIZES if not default_storage.exists(thumbnail_name(name, size))]
+    if not missing:
+        return
+    if not default_storage.exists(name):
+        logger.warning('Cannot generate thumbnails for missing image %s', name)
+        return
+    try:
+        with default_storage.open(name) as file, Image.open(file) as image:
+            image.load()
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            for size in missing:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size))
+                buffer = BytesIO()
+                thumbnail.save(buffer, format='WEBP', quality=80)
+                target = thumbnail_name(name, size)
+                default_storage.save(target, ContentFile(buffer.getvalue()))
+                # 本进程立即可用，不必等缺失记录过期
+                _existing.add(target)
+                _missing.pop(target, None)
+    except Exception:
+        logger.exception('Failed to generate thumbnails for %s', name)
@@ -0,0 +1,163 @@
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Themis.benchmark import current_commit, latency_summary
+from Themis.models import Department, Employee, Project, ProjectMembership, Task
+
+# (路径模板, 权重)，占位符在每次请求时替换为随机抽样的 id
+DEFAULT_MIX = (
+    ('/api/employees/?pagination=keyset&page_size=50', 10),
+    ('/api/employees/?pagination=keyset&ordering=employee_number&page_size=50', 3),
+    ('/api/employees/{employee}/', 5),
+    ('/api/employees/{employee}/basicInfo/', 10),
+    ('/api/employees/search/?q={query}', 10),
+    ('/api/departments/{department}/subtree/', 2),
+    ('/api/projects/?page_size=50', 5),
+    ('/api/projects/{project}/', 5),
+    ('/api/projects/feed/', 5),
+    ('/api/tasks/?project={project}&page_size=50', 10),
+    ('/api/tasks/{task}/', 5),
+    ('/api/tasks/{task}/tree/', 3),
+    ('/api/tasks/rollup/?project={projects}', 2),
+)
+SEARCH_QUERIES = ('王', '张', 'li', 'zh', 'chen', 'wx', '数据', 'sjfx', 'G00', '复旦')
+
+
+def summarize(samples, elapsed):
+    queries = [sample['queries'] for sample in samples]
+    rows = sum(sample['rows'] for sample in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(sample['status'] >= 400 for sample in samples),
+        'latency_ms': latency_summary(sample['latency'] for sample in samples),
+        'queries_per_request': {
+            'mean': sum(queries) / len(queries) if queries else None,
+            'max': max(queries, default=None),
+        },
+        'rows': rows,
+        'rows_per_second': rows / elapsed if elapsed else None,
+    }
+
+
+def response_rows(response):
+    try:
+        data = json.loads(response.content)
+    except ValueError:
+        return 0
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return len(data['results'])
+    if isinstance(data, list):
+        return len(data)
+    return 1
+
+
+class Command(BaseCommand):
+    help = 'Replays a weighted mix of API calls through the test client and reports latency percentiles as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Measured requests.')
+        parser.add_argument('--warmup', type=int, default=50, help='Requests sent before measuring.')
+        parser.add_argument('--mix', help='JSON file with a list of [path, weight] pairs. Paths may use the '
+                                          '{employee}, {project}, {projects}, {task}, {department} and {query} '
+                                          'placeholders.')
+        parser.add_argument('--user', help='Username to authenticate as. Defaults to an employee with projects.')
+        parser.add_argument('--sample', type=int, default=1000, help='Ids sampled per model for the placeholders.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        mix = self.load_mix(options['mix'])
+        ids = {name: list(model.objects.order_by('?').values_list('pk', flat=True)[:options['sample']])
+               for name, model in (('employee', Employee), ('project', Project), ('task', Task),
+                                   ('department', Department))}
+        missing = [name for name, values in ids.items() if not values]
+        if missing:
+            raise CommandError(f'No {", ".join(missing)} rows to benchmark against, run generate_org_data first.')
+
+        try:
+            # 允许 testserver 主机并关闭 DEBUG，与生产环境的开销一致
+            setup_test_environment(debug=False)
+            teardown = teardown_test_environment
+        except RuntimeError:
+            # 已经处于测试环境中，例如在单元测试里调用
+            teardown = None
+        try:
+            client = Client(headers={'Authorization': f'Bearer {self.access_token(options["user"])}'})
+            paths, weights = zip(*mix)
+            for _ in range(options['warmup']):
+                client.get(self.expand(rng.choices(paths, weights)[0], ids, rng))
+            samples = []
+            started = time.perf_counter()
+            for path in rng.choices(paths, weights, k=options['requests']):
+                url = self.expand(path, ids, rng)
+                with CaptureQueriesContext(connection) as queries:
+                    request_started = time.perf_counter()
+                    response = client.get(url)
+                    latency = time.perf_counter() - request_started
+                samples.append({'path': path, 'status': response.status_code, 'latency': latency,
+                                'queries': len(queries), 'rows': response_rows(response)})
+            elapsed = time.perf_counter() - started
+        finally:
+            if teardown:
+                teardown()
+
+        report = {
+            'commit': current_commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'duration': elapsed,
+            'requests_per_second': len(samples) / elapsed if elapsed else None,
+            **summarize(samples, elapsed),
+            'endpoints': {path: summarize([sample for sample in samples if sample['path'] == path],
+                                          sum(sample['latency'] for sample in samples if sample['path'] == path))
+                          for path in paths},
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def load_mix(self, path):
+        if not path:
+            return DEFAULT_MIX
+        try:
+            with open(path) as file:
+                mix = [(str(url), float(weight)) for url, weight in json.load(file)]
+        except (OSError, ValueError, TypeError) as e:
+            raise CommandError(f'Invalid mix file {path}: {e}')
+        if not mix:
+            raise CommandError(f'Mix file {path} is empty.')
+        return mix
+
+    def access_token(self, username):
+        if username:
+            employee = Employee.objects.filter(username=username).first()
+            if employee is None:
+                raise CommandError(f'Unknown user {username}.')
+        else:
+            # 默认选一个参与项目的员工，让 feed 等接口返回数据
+            employee_id = ProjectMembership.objects.values_list('employee_id', flat=True).first()
+            employee = Employee.objects.filter(pk=employee_id).first() or Employee.objects.order_by('id').first()
+        return RefreshToken.for_user(employee).access_token
+
+    @staticmethod
+    def expand(path, ids, rng):
+        return path.format(
+            employee=rng.choice(ids['employee']),
+            project=rng.choice(ids['project']),
+            projects=','.join(map(str, rng.sample(ids['project'], min(20, len(ids['project']))))),
+            task=rng.choice(ids['task']),
+            department=rng.choice(ids['department']),
+            query=rng.choice(SEARCH_QUERIES),
+        )
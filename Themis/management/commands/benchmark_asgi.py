@@ -0,0 +1,162 @@
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLResolver, Resolver404, get_resolver, resolve
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Themis.benchmark import current_commit, latency_summary
+from Themis.models import Employee, Project
+from Themis.views.Employee.views import employee_basic_info_sync
+
+DEFAULT_PATHS = (
+    '/api/employees/{employee}/basicInfo/',
+)
+# 异步视图的同步实现（按 URL 名称），在同一 URL 上各跑一次以对比
+SYNC_VIEWS = {
+    'employee_basic_info': employee_basic_info_sync,
+}
+
+
+async def asgi_get(application, path, headers):
+    """Sends one GET through ``application`` the way an ASGI server would and returns the status code."""
+    url = urlsplit(path)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': url.path,
+        'raw_path': url.path.encode(),
+        'query_string': url.query.encode(),
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    sent_body = False
+    status = None
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # 客户端不会断开，等待直到处理结束后被取消
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    help = ('Sends requests through the ASGI application with many concurrent clients and reports requests/sec and '
+            'latency per path as JSON, keyed by whether the view is sync or async. Async views with a synchronous '
+            'form are run in both forms on the same URL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to benchmark, may be repeated. {employee} and {project} are replaced by '
+                                 'sampled ids.')
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=4000, help='Requests per path.')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS.')
+        parser.add_argument('--sample', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        from Olympus.asgi import application
+
+        rng = random.Random(options['seed'])
+        ids = {'employee': list(Employee.objects.order_by('?').values_list('pk', flat=True)[:options['sample']]),
+               'project': list(Project.objects.order_by('?').values_list('pk', flat=True)[:options['sample']])}
+        if not ids['employee']:
+            raise CommandError('No employees to benchmark against, run generate_org_data first.')
+        token = RefreshToken.for_user(Employee.objects.get(pk=ids['employee'][0])).access_token
+        headers = [(b'host', options['host'].encode()), (b'authorization', f'Bearer {token}'.encode())]
+
+        results = {}
+        for path in options['paths'] or DEFAULT_PATHS:
+            urls = [path.format(employee=rng.choice(ids['employee']),
+                                project=rng.choice(ids['project']) if ids['project'] else 0)
+                    for _ in range(options['requests'])]
+            results[path] = {}
+            pattern = self.sync_form(urls[0])
+            if pattern is not None:
+                callback, pattern.callback = pattern.callback, SYNC_VIEWS[pattern.name]
+                try:
+                    results[path]['sync'] = asyncio.run(self.run(application, urls, headers, options['concurrency']))
+                finally:
+                    pattern.callback = callback
+            results[path][self.view_kind(urls[0])] = asyncio.run(
+                self.run(application, urls, headers, options['concurrency']))
+
+        report = {
+            'commit': current_commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'concurrency': options['concurrency'],
+            'paths': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def view_kind(url):
+        try:
+            return 'async' if iscoroutinefunction(resolve(urlsplit(url).path).func) else 'sync'
+        except Resolver404:
+            return 'unresolved'
+
+    @staticmethod
+    def sync_form(url):
+        """The URL pattern serving ``url`` if it is an async view with a synchronous form in ``SYNC_VIEWS``."""
+        try:
+            match = resolve(urlsplit(url).path)
+        except Resolver404:
+            return None
+        if match.url_name not in SYNC_VIEWS or not iscoroutinefunction(match.func):
+            return None
+        patterns = list(get_resolver().url_patterns)
+        while patterns:
+            pattern = patterns.pop()
+            if isinstance(pattern, URLResolver):
+                patterns.extend(pattern.url_patterns)
+            elif pattern.name == match.url_name:
+                return pattern
+        return None
+
+    @staticmethod
+    async def run(application, urls, headers, concurrency):
+        queue = iter(urls)
+        latencies, statuses = [], []
+
+        async def client():
+            for url in queue:
+                started = time.perf_counter()
+                statuses.append(await asgi_get(application, url, headers))
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            'requests': len(latencies),
+            'errors': sum(status is None or status >= 400 for status in statuses),
+            'requests_per_second': len(latencies) / elapsed,
+            'latency_ms': latency_summary(latencies),
+        }
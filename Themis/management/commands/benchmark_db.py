@@ -0,0 +1,123 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F, Max
+
+from Themis.benchmark import current_commit, latency_summary
+from Themis.models import Employee, Task
+
+
+class Command(BaseCommand):
+    help = ('Runs concurrent readers and writers against the configured database for a fixed time and reports '
+            'throughput and latency as JSON. Run it once per DB_* profile to compare them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        bounds = {
+            'employee': Employee.objects.aggregate(last=Max('id'))['last'],
+            'task': Task.objects.aggregate(last=Max('id'))['last'],
+            'project': Task.objects.aggregate(last=Max('project_id'))['last'],
+        }
+        if not all(bounds.values()):
+            raise CommandError('No employees or tasks to benchmark against, run generate_org_data first.')
+        profile = self.profile()
+        connection.close()
+
+        results = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+        seed = options['seed']
+
+        def worker(kind, n):
+            rng = random.Random(None if seed is None else seed + n)
+            operation = self.read if kind == 'read' else self.write
+            latencies, failed = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation(rng, bounds)
+                    except DatabaseError:
+                        failed += 1
+                    else:
+                        latencies.append(time.perf_counter() - started)
+                    # 模拟请求边界，按 CONN_MAX_AGE 决定是否关闭连接
+                    close_old_connections()
+            finally:
+                connection.close()
+                with lock:
+                    results[kind].extend(latencies)
+                    errors[kind] += failed
+
+        threads = [threading.Thread(target=worker, args=('read', n)) for n in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=('write', options['readers'] + n))
+                    for n in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        report = {
+            'commit': current_commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'profile': profile,
+            'duration': elapsed,
+            'readers': options['readers'],
+            'writers': options['writers'],
+            **{f'{kind}s': {
+                'operations': len(results[kind]),
+                'operations_per_second': len(results[kind]) / elapsed,
+                'errors': errors[kind],
+                'latency_ms': latency_summary(results[kind]),
+            } for kind in ('read', 'write')},
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def profile():
+        profile = {
+            'database': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        }
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                    cursor.execute(f'PRAGMA {name}')
+                    profile[name] = cursor.fetchone()[0]
+        else:
+            profile['server_side_cursors'] = not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS')
+        return profile
+
+    @staticmethod
+    def read(rng, bounds):
+        if rng.random() < 0.5:
+            list(Employee.objects.filter(pk__gte=rng.randint(1, bounds['employee'])).order_by('id')
+                 .values_list('id', 'name', 'employee_number')[:50])
+        else:
+            list(Task.objects.filter(project_id=rng.randint(1, bounds['project'])).order_by('id')
+                 .values_list('id', 'title', 'status', 'deadline')[:50])
+
+    @staticmethod
+    def write(rng, bounds):
+        # 原值写回：加写锁、写日志，但不改变数据
+        with transaction.atomic():
+            Task.objects.filter(pk=rng.randint(1, bounds['task'])).update(priority=F('priority'))
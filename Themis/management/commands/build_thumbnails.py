@@ -0,0 +1,17 @@
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+
+from Themis.images import schedule_thumbnails
+from Themis.models import Employee, Project
+
+
+class Command(BaseCommand):
+    help = 'Generates missing thumbnails for existing avatars and project snapshots.'
+
+    def handle(self, *args, **options):
+        names = set(Employee.objects.exclude(avatar='').values_list('avatar', flat=True).distinct())
+        names |= set(Project.objects.exclude(snapshot='').values_list('snapshot', flat=True).distinct())
+        futures = [schedule_thumbnails(name) for name in names if name]
+        wait([future for future in futures if future])
+        self.stdout.write(self.style.SUCCESS(f'Checked thumbnails for {len(names)} images'))
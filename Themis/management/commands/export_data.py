@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Themis.exports import EXPORT_CHUNK_SIZE, EXPORT_WRITERS, EXPORTS, export_rows
+
+
+class Command(BaseCommand):
+    help = 'Exports every employee, project or task to CSV or XLSX, reading the rows in chunks with constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(EXPORT_WRITERS), default='csv', dest='file_format')
+        parser.add_argument('--output', help='File to write. CSV goes to stdout when omitted.')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Rows fetched from the database cursor at a time.')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if options['file_format'] == 'xlsx' and not output:
+            raise CommandError('XLSX exports need --output.')
+        started = time.perf_counter()
+        header, rows = export_rows(options['name'], chunk_size=options['chunk_size'])
+        writer, _ = EXPORT_WRITERS[options['file_format']]
+        chunks = writer(header, self.count(rows))
+        if not output:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Exported {self.rows} {options["name"]} to {output} in {elapsed:.3f}s'))
+
+    def count(self, rows):
+        self.rows = 0
+        for row in rows:
+            self.rows += 1
+            yield row
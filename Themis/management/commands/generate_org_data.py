@@ -0,0 +1,241 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from Themis.feed import rebuild_memberships
+from Themis.models import OA, Customer, Department, Employee, Position, PositionLevel, Project, ProjectCodeSequence, \
+    ProjectStatus, ProjectType, Task
+from Themis.reference import reference_table
+from Themis.search import index_employees
+
+AREAS = (('华东', 'SH'), ('华北', 'BJ'), ('华南', 'GZ'), ('西南', 'CD'), ('华中', 'WH'), ('西北', 'XA'), ('东北', 'SY'),
+         ('港澳', 'HK'))
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾'
+GIVEN_NAMES = '伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超兰霞平刚华玉萍红玲芬燕彬鹏辉宇浩凯健俊帆帅旭宁龙林欣怡佳琪涵萱轩博文'
+EXPERTISE = ('数据分析', '项目管理', '财务审计', '税务筹划', '软件开发', '市场营销', '法律合规', '人力资源', '供应链', '工程造价')
+SCHOOLS = ('复旦大学', '同济大学', '上海交通大学', '北京大学', '清华大学', '浙江大学', '南京大学', '武汉大学', '中山大学', '四川大学')
+DEPARTMENT_SUFFIXES = ('事业部', '中心', '部', '组', '室')
+TITLES = ('经理', '主管', '专员', '顾问', '工程师', '助理')
+LEVEL_TYPES = ('M', 'P', 'S')
+PROJECT_TYPES = ('审计', '咨询', '税务', '评估', '信息化')
+PROJECT_STATUSES = ('立项', '执行', '报告', '验收', '归档')
+TASK_STATUSES = (('todo', 15), ('in-progress', 35), ('paused', 5), ('cancelled', 5), ('delayed', 10), ('completed', 30))
+TASK_TAGS = (None, '现场', '报告', '复核', '沟通')
+# 每个项目的任务分三批生成：根任务、子任务、孙任务，后一批的父任务取自前一批
+TASK_WAVES = (0.6, 0.25, 0.15)
+
+
+class Command(BaseCommand):
+    help = 'Generates a synthetic organization (departments, employees, projects, tasks) with bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100000)
+        parser.add_argument('--projects', type=int, default=20000)
+        parser.add_argument('--tasks', type=int, default=1000000)
+        parser.add_argument('--departments', type=int, default=2000)
+        parser.add_argument('--depth', type=int, default=8, help='Levels of the department tree.')
+        parser.add_argument('--team-size', type=int, default=12,
+                            help='Employees a project draws its watchers and task DRIs from.')
+        parser.add_argument('--password', default='Olympus@2024', help='Password of every generated employee.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError('The database backend must return primary keys from bulk_create.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.timings = {}
+        self.counts = {}
+        started = time.perf_counter()
+
+        with self.phase('reference'):
+            areas = self.create_areas()
+            levels = self.create_reference_data()
+        with self.phase('departments'):
+            positions = self.create_departments(areas, options['departments'], options['depth'])
+        with self.phase('employees'):
+            employee_ids = self.create_employees(options['employees'], positions, levels, options['password'])
+        with self.phase('projects'):
+            projects = self.create_projects(options['projects'], areas, employee_ids, options['team_size'])
+        with self.phase('tasks'):
+            self.create_tasks(options['tasks'], projects)
+        with self.phase('memberships'):
+            self.counts['memberships'] = rebuild_memberships(self.batch_size)
+
+        elapsed = time.perf_counter() - started
+        for name, seconds in self.timings.items():
+            self.stdout.write(f'{name:>12}: {seconds:.3f}s')
+        rows = sum(self.counts.values())
+        summary = ', '.join(f'{count} {name}' for name, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary} in {elapsed:.3f}s ({rows / elapsed:.0f} rows/s)'))
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        yield
+        self.timings[name] = time.perf_counter() - started
+
+    def bulk_create(self, model, objects):
+        for start in range(0, len(objects), self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(objects[start:start + self.batch_size], batch_size=self.batch_size)
+        self.counts[model._meta.model_name] = self.counts.get(model._meta.model_name, 0) + len(objects)
+        if objects and reference_table(model):
+            # bulk_create 不触发 post_save，手动使参考数据表副本失效
+            reference_table(model).invalidate()
+        return objects
+
+    def create_areas(self):
+        existing = {area.OA_code: area for area in OA.objects.filter(OA_code__in=[code for _, code in AREAS])}
+        missing = [OA(OA_name=name, OA_code=code) for name, code in AREAS if code not in existing]
+        return list(existing.values()) + self.bulk_create(OA, missing)
+
+    def create_reference_data(self):
+        # 重复运行时只补齐缺少的基础数据
+        types = set(ProjectType.objects.values_list('type', flat=True))
+        self.bulk_create(ProjectType, [ProjectType(type=name) for name in PROJECT_TYPES if name not in types])
+        statuses = set(ProjectStatus.objects.values_list('status', flat=True))
+        self.bulk_create(ProjectStatus, [ProjectStatus(status=name, _order_reserved=str(n))
+                                         for n, name in enumerate(PROJECT_STATUSES) if name not in statuses])
+        customers = set(Customer.objects.values_list('name', flat=True))
+        self.bulk_create(Customer, [Customer(name=f'客户{n:04d}', location=self.rng.choice(AREAS)[0])
+                                    for n in range(200) if f'客户{n:04d}' not in customers])
+        levels = set(PositionLevel.objects.values_list('type', 'level'))
+        self.bulk_create(PositionLevel, [PositionLevel(type=level_type, level=str(level))
+                                         for level_type in LEVEL_TYPES for level in range(1, 10)
+                                         if (level_type, str(level)) not in levels])
+        return list(PositionLevel.objects.all())
+
+    def create_departments(self, areas, total, depth):
+        """Builds the tree level by level; paths are filled in once the pks of a level are known."""
+        level = self.bulk_create(Department, [Department(area_id=area.pk, department=f'{area.OA_name}分公司')
+                                              for area in areas])
+        for department in level:
+            department.path = f'/{department.pk}/'
+        Department.objects.bulk_update(level, ['path'], batch_size=self.batch_size)
+        departments = list(level)
+        remaining = max(total - len(level), 0)
+        for current_depth in range(1, depth):
+            size = -(-remaining // (depth - current_depth))
+            if not size:
+                break
+            parents = level
+            level = []
+            for n in range(size):
+                parent = self.rng.choice(parents)
+                name = f'{parent.department[:40]}-{n}{self.rng.choice(DEPARTMENT_SUFFIXES)}'
+                level.append(Department(area_id=parent.area_id, department=name[-100:], parent_department=parent,
+                                        depth=current_depth))
+            self.bulk_create(Department, level)
+            for department in level:
+                department.path = f'{department.parent_department.path}{department.pk}/'
+            Department.objects.bulk_update(level, ['path'], batch_size=self.batch_size)
+            departments.extend(level)
+            remaining -= size
+        return self.bulk_create(Position, [Position(department_id=department.pk, title=title)
+                                           for department in departments
+                                           for title in self.rng.sample(TITLES, 3)])
+
+    def create_employees(self, total, positions, levels, password):
+        # 密码哈希只计算一次，所有员工共用
+        password = make_password(password)
+        first = (Employee.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        today = timezone.localdate()
+        employee_ids = []
+        for start in range(first, first + total, self.batch_size):
+            employees = []
+            for n in range(start, min(start + self.batch_size, first + total)):
+                name = self.rng.choice(SURNAMES) + ''.join(self.rng.choices(GIVEN_NAMES, k=self.rng.randint(1, 2)))
+                employees.append(Employee(
+                    username=f'employee{n}', password=password, name=name, email=f'employee{n}@dihuge.com',
+                    employee_number=f'G{n:07d}', position=self.rng.choice(positions),
+                    position_level=self.rng.choice(levels),
+                    date_joined=today - timedelta(days=self.rng.randint(0, 3650)),
+                    gender=self.rng.choice('MF'), phone=f'13{self.rng.randint(0, 999999999):09d}',
+                    expertise='，'.join(self.rng.sample(EXPERTISE, 2)), graduated_from=self.rng.choice(SCHOOLS),
+                ))
+            self.bulk_create(Employee, employees)
+            index_employees(employees, self.batch_size)
+            employee_ids.extend(employee.pk for employee in employees)
+        return employee_ids
+
+    def create_projects(self, total, areas, employee_ids, team_size):
+        if not employee_ids:
+            raise CommandError('Projects need at least one generated employee.')
+        today = timezone.localdate()
+        types = list(ProjectType.objects.values_list('pk', flat=True))
+        statuses = list(ProjectStatus.objects.values_list('pk', flat=True))
+        customers = list(Customer.objects.values_list('pk', flat=True))
+        projects = []
+        for n in range(total):
+            team = self.rng.sample(employee_ids, min(team_size, len(employee_ids)))
+            project = Project(name=f'项目{n:06d}', area=self.rng.choice(areas), PM_id=team[0], BM_id=team[-1],
+                              type_id=self.rng.choice(types), status_id=self.rng.choice(statuses),
+                              customer_id=self.rng.choice(customers),
+                              initiation_date=today - timedelta(days=self.rng.randint(0, 730)))
+            project.completion_date_est = project.initiation_date + timedelta(days=90)
+            project.team = team
+            projects.append(project)
+
+        # 按区域和立项日期分组，每组一次性预留一段连续编号
+        groups = {}
+        for project in projects:
+            groups.setdefault((project.area.OA_code, project.initiation_date), []).append(project)
+        for (OA_code, initiation_date), group in groups.items():
+            for project, code in zip(group, ProjectCodeSequence.reserve(OA_code, initiation_date, len(group))):
+                project.code = code
+        self.bulk_create(Project, projects)
+
+        through = Project.watched_by.through
+        self.bulk_create(through, [through(project_id=project.pk, employee_id=employee_id)
+                                   for project in projects
+                                   for employee_id in self.rng.sample(project.team, self.rng.randint(0, 5))])
+        return projects
+
+    def create_tasks(self, total, projects):
+        if not projects:
+            return
+        statuses, weights = zip(*TASK_STATUSES)
+        now = timezone.now()
+        per_project, extra = divmod(total, len(projects))
+        chunk, chunk_tasks = [], 0
+        for index, project in enumerate(projects):
+            count = per_project + (index < extra)
+            chunk.append((project, count))
+            chunk_tasks += count
+            if chunk_tasks >= self.batch_size or index == len(projects) - 1:
+                self.create_task_chunk(chunk, statuses, weights, now)
+                chunk, chunk_tasks = [], 0
+
+    def create_task_chunk(self, chunk, statuses, weights, now):
+        parents = {project.pk: [None] for project, _ in chunk}
+        for wave, share in enumerate(TASK_WAVES):
+            tasks = []
+            by_project = {}
+            for project, count in chunk:
+                size = count - sum(int(count * later) for later in TASK_WAVES[1:]) if wave == 0 \
+                    else int(count * share)
+                for n in range(size):
+                    status = self.rng.choices(statuses, weights)[0]
+                    created = now - timedelta(days=self.rng.randint(0, 720), minutes=self.rng.randint(0, 1440))
+                    deadline = created + timedelta(days=self.rng.randint(1, 60))
+                    task = Task(
+                        title=f'{project.name}-{wave}-{n}', status=status, project_id=project.pk,
+                        priority=self.rng.choice(Task.PRIORITY_CHOICES.values),
+                        DRI_id=self.rng.choice(project.team), allocator_id=project.PM_id, created_time=created,
+                        deadline=deadline, completed_time=deadline if status == 'completed' else None,
+                        tag=self.rng.choice(TASK_TAGS), parent_task_id=self.rng.choice(parents[project.pk]),
+                    )
+                    tasks.append(task)
+                    by_project.setdefault(project.pk, []).append(task)
+            self.bulk_create(Task, tasks)
+            for project_id, project_tasks in by_project.items():
+                parents[project_id] = [task.pk for task in project_tasks]
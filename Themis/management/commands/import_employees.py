@@ -1,11 +1,29 @@
+import time
+
 from dateutil import parser
+import numpy as np
 import pandas as pd
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
 from pypinyin import lazy_pinyin
 
-from Themis.models import Employee
+from Themis.models import Employee, Project
 from Themis.models import Department, Position
 from Themis.models import OA
+from Themis.profiles import invalidate_profile_cards
+from Themis import reference
+from Themis.search import INDEXED_FIELDS, index_employees
+
+DATE_COLUMNS = ('date_joined', 'contract_start_date', 'contract_end_date')
+TEXT_COLUMNS = ('salary_place', 'work_place', 'name', 'graduated_from', 'expertise', 'degree', 'employee_number',
+                'status', 'id_number', 'phone', 'contract_place', 'insurance_place', 'id_address', 'bank_number')
+# --sync 时参与比较的字段，登录相关的 username/email/password 不会被覆盖
+SYNC_FIELDS = ('name', 'last_name', 'first_name', 'employee_number', 'position_id', 'date_joined', 'salary_place',
+               'work_place', 'contract_place', 'contract_renewed_times', 'contract_start_date', 'contract_end_date',
+               'insurance_place', 'bank_number', 'gender', 'status', 'expertise', 'phone', 'id_number', 'id_address',
+               'graduated_from', 'degree')
 
 
 class Command(BaseCommand):
@@ -13,16 +31,27 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('excel_path', type=str, help='The path to the Excel file.')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Resolve lookups in one pass and insert employees with batched bulk_create.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk_create call and per transaction in bulk mode.')
+        parser.add_argument('--sync', action='store_true',
+                            help='Match rows to existing employees by employee number or id number, update changed '
+                                 'fields and insert the rest.')
 
     def handle(self, *args, **options):
         excel_path = options['excel_path']
+        if options['sync']:
+            return self.sync_import(excel_path, options['batch_size'])
+        if options['bulk']:
+            return self.bulk_import(excel_path, options['batch_size'])
         data = pd.read_excel(excel_path)
         for _, row in data.iterrows():
             position = None
             if not pd.notna(row['department']):
                 continue
             department = row['department']
-            area, exist = OA.objects.get_or_create(OA_name=row['OA'])
+            area = reference.areas.lookup('OA_name', row['OA']) or OA.objects.create(OA_name=row['OA'])
             if area:
                 department_instance, exist = Department.objects.get_or_create(area=area, department=department)
                 if pd.notna(row['title']):
@@ -103,3 +132,268 @@ class Command(BaseCommand):
             )
 
             print(f'Imported {employee}')
+
+    # region bulk import
+
+    def bulk_import(self, excel_path, batch_size):
+        timings = {}
+        started = time.perf_counter()
+
+        data = read_sheet(excel_path)
+        timings['read'] = time.perf_counter() - started
+
+        phase = time.perf_counter()
+        data = prepare_frame(data)
+        timings['parse'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        position_ids = resolve_positions(data)
+        timings['resolve'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        usernames = set(Employee.objects.values_list('username', flat=True))
+        employees = []
+        for row in data.to_dict('records'):
+            employee = build_employee(row, position_ids)
+            if self.check_required(employee):
+                claim_username(employee, usernames)
+                employees.append(employee)
+        for start in range(0, len(employees), batch_size):
+            try:
+                with transaction.atomic():
+                    Employee.objects.bulk_create(employees[start:start + batch_size], batch_size=batch_size)
+            except IntegrityError as e:
+                # 之前的批次已经提交，报告进度后中止
+                index_employees(employees[:start], batch_size)
+                raise CommandError(f'Rows {start + 1}-{start + batch_size} failed ({e}); the first {start} '
+                                   f'employees were imported, rerun with --sync to import the rest.')
+        timings['insert'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        index_employees(employees, batch_size)
+        timings['index'] = time.perf_counter() - phase
+
+        self.report(len(employees), timings, time.perf_counter() - started)
+
+    def sync_import(self, excel_path, batch_size):
+        timings = {}
+        started = time.perf_counter()
+
+        data = read_sheet(excel_path)
+        timings['read'] = time.perf_counter() - started
+
+        phase = time.perf_counter()
+        total = len(data)
+        data = prepare_frame(data)
+        skipped = total - len(data)
+        timings['parse'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        position_ids = resolve_positions(data)
+        timings['resolve'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        existing = list(Employee.objects.only('id', 'username', *SYNC_FIELDS))
+        usernames = {e.username for e in existing}
+        by_number = {e.employee_number: e for e in existing if e.employee_number}
+        by_id_number = {e.id_number: e for e in by_number.values() if e.id_number}
+        by_id_number.update({e.id_number: e for e in existing if e.id_number and not e.employee_number})
+        timings['load'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        created, changed = [], {}
+        unchanged = 0
+        now = timezone.now()
+        # 前面的行已占用的工号、身份证号和员工，同一个人出现在多行时只取第一行
+        claimed = set()
+        for row in data.to_dict('records'):
+            incoming = build_employee(row, position_ids)
+            if not self.check_required(incoming):
+                skipped += 1
+                continue
+            matched = {by_number.get(incoming.employee_number), by_id_number.get(incoming.id_number)} - {None}
+            if len(matched) > 1:
+                # 工号和身份证号分别对应了不同员工，无法判断应更新哪一条
+                self.stderr.write(f'Skipped {incoming.name}: employee number and id number match different employees')
+                skipped += 1
+                continue
+            keys = {('employee_number', incoming.employee_number), ('id_number', incoming.id_number)}
+            keys = {key for key in keys if key[1]} | {('id', employee.pk) for employee in matched}
+            if keys & claimed:
+                self.stderr.write(f'Skipped {incoming.name}: same employee as an earlier row')
+                skipped += 1
+                continue
+            claimed |= keys
+            if not matched:
+                claim_username(incoming, usernames)
+                created.append(incoming)
+                continue
+            current = matched.pop()
+            fields = [field for field in SYNC_FIELDS if getattr(current, field) != getattr(incoming, field)
+                      and not (field == 'date_joined' and row['date_joined'] is None)]
+            if not fields:
+                unchanged += 1
+                continue
+            for field in fields:
+                setattr(current, field, getattr(incoming, field))
+            # bulk_update 不会应用 auto_now
+            current.updated_at = now
+            changed.setdefault((*fields, 'updated_at'), []).append(current)
+        timings['diff'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        # 整个同步在一个事务中写入，任何一行失败都不会留下部分结果
+        with transaction.atomic():
+            # 按变更字段分组，每组只更新实际变化的列
+            for fields, employees in changed.items():
+                Employee.objects.bulk_update(employees, fields, batch_size=batch_size)
+            Employee.objects.bulk_create(created, batch_size=batch_size)
+            # bulk_update 不会触发 post_save，需要手动失效员工名片缓存
+            invalidate_profile_cards([e.pk for employees in changed.values() for e in employees])
+            renamed = [e.pk for fields, employees in changed.items() if 'name' in fields for e in employees]
+            if renamed:
+                Project.objects.filter(Q(PM__in=renamed) | Q(BM__in=renamed) | Q(watched_by__in=renamed)).update(
+                    updated_at=now)
+        timings['write'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        index_employees(created + [e for fields, employees in changed.items()
+                                   if set(fields) & set(INDEXED_FIELDS) for e in employees], batch_size)
+        timings['index'] = time.perf_counter() - phase
+
+        updated = sum(len(employees) for employees in changed.values())
+        self.report(len(data), timings, time.perf_counter() - started)
+        self.stdout.write(self.style.SUCCESS(
+            f'inserted={len(created)} updated={updated} unchanged={unchanged} skipped={skipped}'))
+
+    def check_required(self, employee):
+        if not employee.phone:
+            self.stderr.write(f'Skipped {employee.name}: no phone number')
+            return False
+        return True
+
+    def report(self, rows, timings, elapsed):
+        for name, seconds in timings.items():
+            self.stdout.write(f'{name:>10}: {seconds:.3f}s')
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Processed {rows} employees in {elapsed:.3f}s ({rate:.0f} rows/s)'))
+
+    # endregion
+
+
+def read_sheet(excel_path):
+    # 文本列按原始值读取，避免长数字（身份证号、银行卡号）被转成浮点数丢失精度
+    return pd.read_excel(excel_path, dtype={column: object for column in TEXT_COLUMNS})
+
+
+def prepare_frame(data):
+    """Drop rows without a department and normalise every column in vectorised form."""
+    data = data[data['department'].notna()].copy()
+    for column in DATE_COLUMNS:
+        parsed = pd.to_datetime(data[column], errors='coerce')
+        data[column] = parsed.dt.date.astype(object).where(parsed.notna(), None)
+    data['gender'] = np.where(data['gender'] == '男', 'M', 'F')
+    data['contract_renewed_times'] = pd.to_numeric(data['contract_renewed_times'], errors='coerce') \
+        .fillna(0).astype(int)
+    for column in TEXT_COLUMNS:
+        data[column] = data[column].map(as_text) if column in data else None
+    data = data.astype(object).where(data.notna(), None)
+    data['username'] = data['name'].map(lambda name: "".join(lazy_pinyin(name)))
+    return data
+
+
+def as_text(value):
+    # Excel 中的工号、身份证号等会被 pandas 读成数字
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def resolve_positions(data):
+    """
+    Get or create every OA, Department and Position referenced by ``data`` with a constant number of queries.
+    Returns a mapping of (OA name, department, title) to position id.
+    """
+    oa_names = set(data['OA'])
+    # 区域从参考数据表的内存副本中查找
+    missing = [OA(OA_name=name) for name in oa_names if reference.areas.lookup('OA_name', name) is None]
+    if missing:
+        OA.objects.bulk_create(missing)
+        # bulk_create 不触发 post_save，手动使区域表副本失效
+        reference.areas.invalidate()
+    areas = {name: reference.areas.lookup('OA_name', name).id for name in oa_names}
+
+    department_keys = {(areas[row.OA], row.department) for row in data[['OA', 'department']].itertuples()}
+    departments = {(d.area_id, d.department): d.id for d in
+                   Department.objects.filter(area_id__in=set(areas.values()),
+                                             department__in={key[1] for key in department_keys})}
+    missing = [Department(area_id=area_id, department=department) for area_id, department in
+               department_keys - departments.keys()]
+    if missing:
+        Department.objects.bulk_create(missing)
+        Department.assign_root_paths(Department.objects.all())
+        departments = {(d.area_id, d.department): d.id for d in
+                       Department.objects.filter(area_id__in=set(areas.values()),
+                                                 department__in={key[1] for key in department_keys})}
+
+    titled = data[data['title'].notna()]
+    position_keys = {(departments[(areas[row.OA], row.department)], row.title) for row in
+                     titled[['OA', 'department', 'title']].itertuples()}
+    positions = {(p.department_id, p.title): p.id for p in
+                 Position.objects.filter(department_id__in={key[0] for key in position_keys})}
+    missing = [Position(department_id=department_id, title=title) for department_id, title in
+               position_keys - positions.keys()]
+    if missing:
+        Position.objects.bulk_create(missing)
+        positions = {(p.department_id, p.title): p.id for p in
+                     Position.objects.filter(department_id__in={key[0] for key in position_keys})}
+
+    return {(row.OA, row.department, row.title): positions[(departments[(areas[row.OA], row.department)], row.title)]
+            for row in titled[['OA', 'department', 'title']].itertuples()}
+
+
+def claim_username(employee, taken):
+    """
+    Gives a new ``employee`` the smallest numeric suffix that makes its username (and e-mail) unique among
+    ``taken``, e.g. a second 王伟 becomes wangwei2, and adds it to ``taken``.
+    """
+    username, n = employee.username, 1
+    while username in taken:
+        n += 1
+        username = f'{employee.username}{n}'
+    taken.add(username)
+    employee.username = username
+    employee.email = username + '@dihuge.com'
+
+
+def build_employee(row, position_ids):
+    name = row['name']
+    username = row['username']
+    return Employee(
+        name=name,
+        last_name=name[0],
+        first_name=name[1:],
+        username=username,
+        employee_number=row['employee_number'] or '',
+        position_id=position_ids.get((row['OA'], row['department'], row['title'])),
+        date_joined=row['date_joined'] or timezone.localdate(),
+        salary_place=row['salary_place'],
+        work_place=row['work_place'],
+        contract_place=row['contract_place'],
+        contract_renewed_times=row['contract_renewed_times'],
+        contract_start_date=row['contract_start_date'],
+        contract_end_date=row['contract_end_date'],
+        insurance_place=row['insurance_place'],
+        bank_number=row['bank_number'],
+        gender=row['gender'],
+        status=row['status'],
+        expertise=row['expertise'],
+        phone=row['phone'],
+        id_number=row['id_number'],
+        id_address=row['id_address'],
+        graduated_from=row['graduated_from'],
+        degree=row['degree'],
+        email=username + '@dihuge.com'
+    )
@@ -1,15 +1,62 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
 from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+INITIAL_PASSWORD = 'dihuge123'
+
+
+def _setup_worker():
+    # 使用 spawn 启动子进程时需要重新初始化 Django
+    django.setup()
+
 
-from Themis.models import Employee
+def _hash(password):
+    return make_password(password)
 
 
 class Command(BaseCommand):
     help = 'Sets initial passwords for all users who do not have one.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Accounts hashed and written back per batch.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of hashing processes.')
+
     def handle(self, *args, **options):
-        users = Employee.objects.filter(password='')  # 或使用更合适的筛选条件，如password__isnull=True
-        for user in users:
-            user.password = make_password('dihuge123')
-            user.save()
-            self.stdout.write(self.style.SUCCESS(f'Successfully set password for {user.username}'))
+        # 子进程以 spawn/forkserver 启动时会导入本模块，此时 Django 尚未初始化，不能在模块顶层导入模型
+        from Themis.models import Employee
+
+        batch_size = options['batch_size']
+        # 或使用更合适的筛选条件，如password__isnull=True
+        users = list(Employee.objects.filter(password='').values_list('id', flat=True))
+        if not users:
+            self.stdout.write('No users without a password.')
+            return
+
+        started = time.perf_counter()
+        done = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_setup_worker) as pool:
+            for start in range(0, len(users), batch_size):
+                batch = users[start:start + batch_size]
+                chunksize = max(1, len(batch) // (options['workers'] * 4))
+                hashes = pool.map(_hash, [INITIAL_PASSWORD] * len(batch), chunksize=chunksize)
+                # bulk_update 不会应用 auto_now
+                now = timezone.now()
+                employees = [Employee(id=user_id, password=password, updated_at=now)
+                             for user_id, password in zip(batch, hashes)]
+                with transaction.atomic():
+                    Employee.objects.bulk_update(employees, ['password', 'updated_at'], batch_size=batch_size)
+                done += len(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{done}/{len(users)} passwords set ({done / elapsed:.1f}/s)')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully set password for {done} users in {elapsed:.2f}s ({done / elapsed:.1f}/s)'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Themis.feed import rebuild_memberships
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-employee project membership index behind the project feed.'
+
+    def handle(self, *args, **options):
+        rows = rebuild_memberships()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} project memberships'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from Themis.models import EmployeeSearchTerm
+from Themis.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the employee typeahead search index.'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {EmployeeSearchTerm.objects.count()} search terms'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Themis.sweeper import sweep_overdue_tasks
+
+
+class Command(BaseCommand):
+    help = 'Marks open tasks past their deadline as delayed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and sweep every INTERVAL seconds instead of once.')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore the watermark and rescan every past deadline.')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            started = time.perf_counter()
+            swept = sweep_overdue_tasks(full=full)
+            self.stdout.write(f'Marked {swept} tasks as delayed in {time.perf_counter() - started:.3f}s')
+            if not options['interval']:
+                return
+            full = False
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,102 @@
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from Themis.profiles import profile_card_stats
+from Themis.reference import reference_cache_stats
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+METRICS_ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label value, kept in process memory."""
+
+    def __init__(self, name, documentation, buckets, label='view'):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label = label
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            counts, total = self.series.get(label_value, ([0] * (len(self.buckets) + 1), 0))
+            # 最后一个计数对应 +Inf
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[label_value] = (counts, total + value)
+
+    def samples(self, label_value):
+        with self._lock:
+            counts, total = self.series[label_value]
+            return list(counts), total
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_value in sorted(self.series):
+            counts, total = self.samples(label_value)
+            label = f'{self.label}="{escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self.series.clear()
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_duration = Histogram('olympus_request_duration_seconds', 'Total time spent handling the request.',
+                             DURATION_BUCKETS)
+view_duration = Histogram('olympus_view_duration_seconds', 'Time spent in the view, including serialization.',
+                          DURATION_BUCKETS)
+render_duration = Histogram('olympus_render_duration_seconds', 'Time spent rendering the response body.',
+                            DURATION_BUCKETS)
+db_duration = Histogram('olympus_db_duration_seconds', 'Time spent executing database queries.', DURATION_BUCKETS)
+db_queries = Histogram('olympus_db_queries', 'Database queries executed per request.', QUERY_BUCKETS)
+HISTOGRAMS = (request_duration, view_duration, render_duration, db_duration, db_queries)
+
+
+def record(view_name, timing):
+    request_duration.observe(view_name, timing.total)
+    view_duration.observe(view_name, timing.view)
+    render_duration.observe(view_name, timing.render)
+    db_duration.observe(view_name, timing.db)
+    db_queries.observe(view_name, timing.queries)
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.append('# HELP olympus_profile_card_cache_total Profile card cache lookups.')
+    lines.append('# TYPE olympus_profile_card_cache_total counter')
+    for result, count in sorted(profile_card_stats().items()):
+        lines.append(f'olympus_profile_card_cache_total{{result="{result}"}} {count}')
+    lines.append('# HELP olympus_reference_cache_total Reference table lookups and reloads.')
+    lines.append('# TYPE olympus_reference_cache_total counter')
+    for table, stats in sorted(reference_cache_stats().items()):
+        for result, count in sorted(stats.items()):
+            lines.append(f'olympus_reference_cache_total{{table="{table}",result="{result}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """
+    Prometheus text exposition of the histograms recorded by ``PerformanceMiddleware``. Every worker process keeps
+    its own numbers, so each process has to be scraped. Only clients in ``METRICS_ALLOWED_IPS`` may read it.
+    """
+    if request.META.get('REMOTE_ADDR') not in METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,149 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from Themis import metrics
+
+logger = logging.getLogger(__name__)
+
+# 超过该耗时（毫秒）的请求记录其全部 SQL
+SLOW_REQUEST_THRESHOLD_MS = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500)
+# 慢请求日志中最多保留的 SQL 条数
+SLOW_REQUEST_MAX_QUERIES = 200
+
+# 当前请求的计时对象；上下文变量会随 sync_to_async 带入执行查询的线程
+_current_timing = ContextVar('request_timing', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    timing = _current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def instrument(connection):
+    """
+    Installs ``record_query`` on ``connection`` for good. Connections are per thread and async views query from
+    executor threads, so the wrapper cannot be scoped to the request; it is attached to every new connection by
+    ``Themis.signals`` and finds the request through a context variable.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.finished = None
+        self.queries = 0
+        self.db = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db += duration
+            if len(self.statements) < SLOW_REQUEST_MAX_QUERIES:
+                # 参数可能含证件号、银行卡号、密码哈希等，不保留
+                self.statements.append((duration, sql))
+
+    @property
+    def total(self):
+        return self.finished - self.started
+
+    @property
+    def view(self):
+        if self.view_started is None:
+            return 0.0
+        return (self.view_finished or self.finished) - self.view_started
+
+    @property
+    def render(self):
+        if self.view_finished is None:
+            return 0.0
+        return self.finished - self.view_finished
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'view;dur={self.view * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+
+class PerformanceMiddleware:
+    """
+    Times every request: query count and DB time (through an execute wrapper on every connection), view time and
+    render time. The numbers go out in a ``Server-Timing`` header and into the histograms of ``Themis.metrics``,
+    labelled with the resolved URL name. Requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` log their SQL.
+    Works in both sync and async stacks, so it does not force async views back onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with self.timed(request) as timing:
+            response = self.get_response(request)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        with self.timed(request) as timing:
+            response = await self.get_response(request)
+        return self.finish(request, response, timing)
+
+    @contextmanager
+    def timed(self, request):
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+        timing = request._timing = RequestTiming()
+        token = _current_timing.set(timing)
+        try:
+            yield timing
+        finally:
+            _current_timing.reset(token)
+        timing.finished = time.perf_counter()
+
+    def finish(self, request, response, timing):
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or '<unresolved>'
+        metrics.record(view_name, timing)
+        response['Server-Timing'] = timing.server_timing()
+        if timing.total * 1000 >= SLOW_REQUEST_THRESHOLD_MS:
+            self.log_slow_request(request, view_name, timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # 视图已返回、尚未渲染，DRF 的 Response 也走这里
+        request._timing.view_finished = time.perf_counter()
+        return response
+
+    @staticmethod
+    def log_slow_request(request, view_name, timing):
+        statements = '\n'.join(f'  {duration * 1000:.1f}ms {sql}' for duration, sql in timing.statements)
+        logger.warning('Slow request %s %s (%s) took %.1fms, %d queries in %.1fms\n%s',
+                       request.method, request.get_full_path(), view_name, timing.total * 1000, timing.queries,
+                       timing.db * 1000, statements)
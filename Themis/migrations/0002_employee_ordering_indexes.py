@@ -0,0 +1,22 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['employee_number', 'id'], name='Themis_empl_employe_dd8b7b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['date_joined', 'id'], name='Themis_empl_date_jo_fe6b08_idx'),
+        ),
+    ]
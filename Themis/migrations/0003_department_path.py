@@ -0,0 +1,46 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    Department = apps.get_model('Themis', 'Department')
+    departments = list(Department.objects.only('id', 'parent_department_id'))
+    children = {}
+    for department in departments:
+        children.setdefault(department.parent_department_id, []).append(department)
+    by_id = {department.id: department for department in departments}
+    # 没有上级部门（或上级部门已不存在）的部门作为根节点
+    stack = [(department, '/', 0) for department in departments
+             if department.parent_department_id not in by_id]
+    visited = set()
+    while stack:
+        department, parent_path, depth = stack.pop()
+        if department.id in visited:
+            continue
+        visited.add(department.id)
+        department.path = f'{parent_path}{department.id}/'
+        department.depth = depth
+        stack.extend((child, department.path, depth + 1) for child in children.get(department.id, []))
+    Department.objects.bulk_update([by_id[pk] for pk in visited], ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0002_employee_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='层级'),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255, verbose_name='部门路径'),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:55
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    Project = apps.get_model('Themis', 'Project')
+    ProjectCodeSequence = apps.get_model('Themis', 'ProjectCodeSequence')
+    last_numbers = {}
+    for code in Project.objects.exclude(code__isnull=True).values_list('code', flat=True):
+        # 项目编号格式为 {OA_code}-{YYYYMMDD}-{序号}
+        prefix, _, number = code.rpartition('-')
+        OA_code, _, date_str = prefix.rpartition('-')
+        try:
+            key = (OA_code, datetime.strptime(date_str, '%Y%m%d').date())
+            number = int(number)
+        except ValueError:
+            continue
+        last_numbers[key] = max(last_numbers.get(key, 0), number)
+    ProjectCodeSequence.objects.bulk_create(
+        [ProjectCodeSequence(OA_code=OA_code, date=date, last_number=number)
+         for (OA_code, date), number in last_numbers.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0003_department_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('OA_code', models.CharField(max_length=20, verbose_name='区域代码')),
+                ('date', models.DateField(verbose_name='立项日期')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='当前序号')),
+            ],
+            options={
+                'verbose_name': '项目编号序列',
+                'verbose_name_plural': '项目编号序列',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='projectcodesequence',
+            constraint=models.UniqueConstraint(fields=('OA_code', 'date'), name='unique_project_code_sequence'),
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
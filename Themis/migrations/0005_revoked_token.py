@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0004_project_code_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True, verbose_name='令牌ID')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='过期时间')),
+                ('revoked_at', models.DateTimeField(auto_now_add=True, verbose_name='注销时间')),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='员工')),
+            ],
+            options={
+                'verbose_name': '已注销令牌',
+                'verbose_name_plural': '已注销令牌',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0005_revoked_token'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='task',
+            options={'verbose_name': '任务', 'verbose_name_plural': '任务'},
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'status'], name='Themis_task_project_248230_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'priority'], name='Themis_task_project_3b91ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['DRI', 'status', 'deadline'], name='Themis_task_DRI_id_ba83fd_idx'),
+        ),
+    ]
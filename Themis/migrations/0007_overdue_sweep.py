@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0006_task_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='名称')),
+                ('watermark', models.DateTimeField(blank=True, null=True, verbose_name='水位')),
+            ],
+            options={
+                'verbose_name': '任务水位',
+                'verbose_name_plural': '任务水位',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['deadline', 'status'], name='Themis_task_deadlin_852ccf_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.3 on 2026-10-18 18:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_memberships(apps, schema_editor):
+    Project = apps.get_model('Themis', 'Project')
+    Task = apps.get_model('Themis', 'Task')
+    ProjectMembership = apps.get_model('Themis', 'ProjectMembership')
+    rows = set()
+    for project_id, pm_id, bm_id in Project.objects.values_list('id', 'PM_id', 'BM_id'):
+        if pm_id:
+            rows.add((pm_id, project_id, 'PM'))
+        if bm_id:
+            rows.add((bm_id, project_id, 'BM'))
+    rows.update((employee_id, project_id, 'watcher') for employee_id, project_id in
+                Project.watched_by.through.objects.values_list('employee_id', 'project_id'))
+    rows.update((employee_id, project_id, 'DRI') for employee_id, project_id in
+                Task.objects.filter(DRI__isnull=False).values_list('DRI_id', 'project_id').distinct())
+    ProjectMembership.objects.bulk_create(
+        [ProjectMembership(employee_id=employee_id, project_id=project_id, role=role)
+         for employee_id, project_id, role in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0007_overdue_sweep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('PM', '项目经理'), ('BM', '商务经理'), ('watcher', '关注'), ('DRI', '任务负责人')], max_length=10, verbose_name='角色')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_memberships', to=settings.AUTH_USER_MODEL, verbose_name='员工')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='Themis.project', verbose_name='项目')),
+            ],
+            options={
+                'verbose_name': '项目成员',
+                'verbose_name_plural': '项目成员',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='projectmembership',
+            constraint=models.UniqueConstraint(fields=('employee', 'project', 'role'), name='unique_project_membership'),
+        ),
+        migrations.RunPython(build_memberships, migrations.RunPython.noop),
+    ]
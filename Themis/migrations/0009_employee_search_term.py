@@ -0,0 +1,40 @@
+# Generated by Django 5.0.3 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_index(apps, schema_editor):
+    from Themis.search import search_terms
+
+    Employee = apps.get_model('Themis', 'Employee')
+    EmployeeSearchTerm = apps.get_model('Themis', 'EmployeeSearchTerm')
+    EmployeeSearchTerm.objects.bulk_create(
+        [EmployeeSearchTerm(employee_id=employee.pk, term=term)
+         for employee in Employee.objects.only('id', 'name', 'expertise', 'graduated_from', 'employee_number')
+         for term in search_terms(employee)], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Themis', '0008_project_membership'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='搜索词')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL, verbose_name='员工')),
+            ],
+            options={
+                'verbose_name': '员工搜索词',
+                'verbose_name_plural': '员工搜索词',
+                'indexes': [models.Index(fields=['term', 'employee'], name='Themis_empl_term_f0ef03_idx')],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -3,3 +3,4 @@ from .financial import *
 from .operation import *
 from .position import *
 from .project import *
+from .token import *
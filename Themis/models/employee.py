@@ -20,7 +20,11 @@ class Employee(AbstractUser):
     class Meta:
         verbose_name = _("员工")
         verbose_name_plural = _("员工")
-
+        # 列表分页可按工号、入职时间排序，id 作为第二键保证游标稳定
+        indexes = [
+            models.Index(fields=['employee_number', 'id']),
+            models.Index(fields=['date_joined', 'id']),
+        ]
 
     def validate_phone_number(value):
         phone_regex = re.compile(r'^\+?1?\d{9,15}$')
@@ -64,6 +68,8 @@ class Employee(AbstractUser):
     id_address = models.CharField(max_length=200, null=True, blank=True)
     graduated_from = models.CharField(max_length=30, null=True, blank=True)
     degree = models.CharField(max_length=30, null=True, blank=True)
+    # 最后修改时间，用于生成 ETag/Last-Modified；岗位、部门、职级变化时也由信号刷新
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name=_("更新时间"))
 
     groups = models.ManyToManyField(
         Group,
@@ -86,3 +92,24 @@ class Employee(AbstractUser):
 
     def __str__(self):
         return f'{self.name}-{self.employee_number}'
+
+
+class EmployeeSearchTerm(models.Model):
+    """
+    Typeahead index: every searchable term of an employee (name suffixes with their full pinyin and initials,
+    expertise, school, employee number), lower-cased. Maintained by ``Themis.search``.
+    """
+
+    class Meta:
+        verbose_name = _("员工搜索词")
+        verbose_name_plural = _("员工搜索词")
+        indexes = [
+            models.Index(fields=['term', 'employee']),
+        ]
+
+    employee = models.ForeignKey(Employee, related_name="search_terms", on_delete=models.CASCADE,
+                                 verbose_name=_("员工"))
+    term = models.CharField(max_length=64, verbose_name=_("搜索词"))
+
+    def __str__(self):
+        return f'{self.term}'
@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, Concat, Substr
 from django.utils.translation import gettext_lazy as _
 from Themis.models.operation import  OA
 # region  Position related models
@@ -48,10 +51,65 @@ class Department(models.Model):
                                           blank=True,
                                           on_delete=models.SET_NULL,
                                           verbose_name=_("上级部门"))
+    # 物化路径，形如 /1/5/12/，由 save() 维护，用于一次查询取出整棵子树
+    path = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False,
+                            verbose_name=_("部门路径"))
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name=_("层级"))
 
     def __str__(self):
         return f'{self.area}{self.department}'
 
+    def clean(self):
+        super().clean()
+        stored = self._stored_paths()
+        self._check_parent(stored.get(self.pk, ""), stored.get(self.parent_department_id))
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # 锁定本部门和上级部门，并发移动依次执行；路径从数据库读取，避免内存中的实例在祖先移动后已过期
+            stored = self._stored_paths(lock=True)
+            old_path = stored.get(self.pk, "")
+            parent_path = stored.get(self.parent_department_id)
+            # clean() 已校验过，加锁后再查一次，防止校验之后上级部门被并发移动
+            self._check_parent(old_path, parent_path)
+            super().save(*args, **kwargs)
+            self.path = f'{parent_path or "/"}{self.pk}/'
+            self.depth = self.path.count('/') - 2
+            if self.path == old_path:
+                return
+            if old_path:
+                # 整棵子树的路径前缀一次性替换
+                Department.objects.filter(path__startswith=old_path).update(
+                    path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + self.depth - old_path.count('/') + 2,
+                )
+            else:
+                Department.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
+    def _stored_paths(self, lock=False):
+        queryset = Department.objects.filter(pk__in=[self.pk, self.parent_department_id])
+        if lock:
+            # 按主键顺序加锁，避免两个移动互相等待
+            queryset = queryset.select_for_update().order_by('pk')
+        return dict(queryset.values_list('id', 'path'))
+
+    def _check_parent(self, old_path, parent_path):
+        if self.parent_department_id is not None and not parent_path:
+            # 例如 bulk_create 创建后尚未执行 assign_root_paths，否则本部门会被当作根部门
+            raise ValidationError({'parent_department': _("上级部门缺少部门路径")})
+        if parent_path and old_path and parent_path.startswith(old_path):
+            raise ValidationError({'parent_department': _("不能将部门移动到其自身或下级部门之下")})
+
+    def get_descendants(self, include_self=True):
+        descendants = Department.objects.filter(path__startswith=self.path)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
+    @staticmethod
+    def assign_root_paths(queryset):
+        """Sets the path of departments created without save() (e.g. bulk_create) as roots."""
+        return queryset.filter(path="").update(
+            path=Concat(Value('/'), Cast('id', output_field=CharField()), Value('/')), depth=0)
+
 
 class Position(models.Model):
     class Meta:
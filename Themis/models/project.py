@@ -1,7 +1,8 @@
 # region Project related models
 from datetime import timedelta
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -44,6 +45,37 @@ class Customer(models.Model):
         return f'{self.name}-{self.location}'
 
 
+class ProjectCodeSequence(models.Model):
+    """
+    Last allocated project number per (OA_code, initiation date). Numbers are handed out by an atomic increment so
+    concurrent project creation never yields duplicate codes.
+    """
+
+    class Meta:
+        verbose_name = _("项目编号序列")
+        verbose_name_plural = _("项目编号序列")
+        constraints = [
+            models.UniqueConstraint(fields=['OA_code', 'date'], name='unique_project_code_sequence'),
+        ]
+
+    OA_code = models.CharField(max_length=20, null=False, verbose_name=_("区域代码"))
+    date = models.DateField(null=False, verbose_name=_("立项日期"))
+    last_number = models.PositiveIntegerField(default=0, verbose_name=_("当前序号"))
+
+    @classmethod
+    def reserve(cls, OA_code, date, count=1):
+        """Allocates ``count`` consecutive project codes for the area and day and returns them in order."""
+        sequence = cls.objects.filter(OA_code=OA_code, date=date)
+        with transaction.atomic():
+            # 递增语句会锁住该行，并发的分配在此排队
+            if not sequence.update(last_number=F('last_number') + count):
+                cls.objects.bulk_create([cls(OA_code=OA_code, date=date)], ignore_conflicts=True)
+                sequence.update(last_number=F('last_number') + count)
+            last_number = sequence.values_list('last_number', flat=True).get()
+        date_str = date.strftime("%Y%m%d")
+        return [f"{OA_code}-{date_str}-{number:03d}" for number in range(last_number - count + 1, last_number + 1)]
+
+
 class Project(models.Model):
     class Meta:
         verbose_name = _("项目")
@@ -68,31 +100,41 @@ class Project(models.Model):
     initiation_date = models.DateField(null=True, blank=True, verbose_name=_("立项日期"))
     completion_date_est = models.DateField(null=True, blank=True, verbose_name=_("预计验收日期"))
     watched_by = models.ManyToManyField(Employee, related_name="watched_projects", verbose_name=_("关注项目"), )
+    # 项目看板中的任务统计、人员和基础数据名称变化时也由信号刷新
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name=_("更新时间"))
 
     def save(self, *args, **kwargs):
-        if not self.code:  # 仅在项目编号未设置时生成
-            print("generating code")
-            date_str = self.initiation_date.strftime("%Y%m%d")
-            last_project = Project.objects.filter(initiation_date=self.initiation_date, area=self.area).order_by(
-                "id").last()
-            if last_project and last_project.code:
-                last_number = int(last_project.code.split("-")[-1])
-                new_number = f"{last_number + 1:03d}"  # 序列号加一
-            else:
-                new_number = "001"  # 当天第一个项目
-                self.code = f"{self.area.OA_code}-{date_str}-{new_number}"
-
-            # 设置结项日期默认值为立项日期后三个月
-            if not self.completion_date_est:
-                self.completion_date_est = self.initiation_date + timedelta(days=90)
-
-            super().save(*args, **kwargs)
+        # 只更新部分字段时（如上传快照）不触碰编号和日期，避免加载被 only() 延迟的字段
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'code', 'completion_date_est'} & set(update_fields):
+            return super().save(*args, **kwargs)
+
+        if not self.code and self.area and self.initiation_date:  # 仅在项目编号未设置时生成
+            self.code = ProjectCodeSequence.reserve(self.area.OA_code, self.initiation_date)[0]
+
+        # 设置结项日期默认值为立项日期后三个月
+        if not self.completion_date_est and self.initiation_date:
+            self.completion_date_est = self.initiation_date + timedelta(days=90)
+
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.code}-{self.name}'
 
 
 class Task(models.Model):
+    class Meta:
+        verbose_name = _("任务")
+        verbose_name_plural = _("任务")
+        # 对应任务看板的常用筛选组合
+        indexes = [
+            models.Index(fields=['project', 'status']),
+            models.Index(fields=['project', 'priority']),
+            models.Index(fields=['DRI', 'status', 'deadline']),
+            # 逾期扫描按截止时间做范围查询
+            models.Index(fields=['deadline', 'status']),
+        ]
+
     class STATUS_CHOICES(models.TextChoices):
         TODO = "todo", _("待分配")
         IN_PROGRESS = "in-progress", _("进行中")
@@ -124,5 +166,71 @@ class Task(models.Model):
     tag = models.CharField(max_length=50, null=True, blank=True, verbose_name=_(""))
     description = models.TextField(max_length=2000, null=True, blank=True, verbose_name=_(""))
     parent_task = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, verbose_name=_(""))
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name=_("更新时间"))
+
+    @classmethod
+    def subtree(cls, root_id):
+        """
+        The task ``root_id`` and all of its descendants, fetched with one recursive CTE (SQLite and PostgreSQL).
+        Each task carries a ``depth`` attribute, the root being 0.
+        """
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        columns = [qn(field.column) for field in cls._meta.concrete_fields]
+        select = ', '.join(f't.{column}' for column in columns)
+        # 每个任务只有一个上级，parent_task 成环时只可能绕回根任务，遇到根任务即停止递归
+        sql = (
+            f'WITH RECURSIVE tree ({", ".join(columns)}, depth) AS ('
+            f'SELECT {select}, 0 FROM {table} t WHERE t.{qn("id")} = %s '
+            f'UNION ALL '
+            f'SELECT {select}, tree.depth + 1 FROM {table} t '
+            f'JOIN tree ON t.{qn("parent_task_id")} = tree.{qn("id")} WHERE t.{qn("id")} <> %s'
+            f') SELECT * FROM tree'
+        )
+        return list(cls.objects.raw(sql, [root_id, root_id]))
+
+
+
+class ProjectMembership(models.Model):
+    """
+    Denormalized index of how an employee is involved in a project, maintained by signals on Project, its watchers
+    and Task. Backs the per-employee project feed.
+    """
+
+    class ROLE_CHOICES(models.TextChoices):
+        PM = "PM", _("项目经理")
+        BM = "BM", _("商务经理")
+        WATCHER = "watcher", _("关注")
+        DRI = "DRI", _("任务负责人")
+
+    class Meta:
+        verbose_name = _("项目成员")
+        verbose_name_plural = _("项目成员")
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'project', 'role'], name='unique_project_membership'),
+        ]
+
+    employee = models.ForeignKey(Employee, related_name="project_memberships", on_delete=models.CASCADE,
+                                 verbose_name=_("员工"))
+    project = models.ForeignKey(Project, related_name="memberships", on_delete=models.CASCADE,
+                                verbose_name=_("项目"))
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES.choices, verbose_name=_("角色"))
+
+    def __str__(self):
+        return f'{self.employee_id}-{self.project_id}-{self.role}'
+
+
+class JobWatermark(models.Model):
+    """Progress marker of a periodic job, e.g. the deadline up to which overdue tasks have been swept."""
+
+    class Meta:
+        verbose_name = _("任务水位")
+        verbose_name_plural = _("任务水位")
+
+    name = models.CharField(max_length=50, unique=True, verbose_name=_("名称"))
+    watermark = models.DateTimeField(null=True, blank=True, verbose_name=_("水位"))
+
+    def __str__(self):
+        return f'{self.name}-{self.watermark}'
 
 # endregion
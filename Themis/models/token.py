@@ -0,0 +1,19 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from Themis.models.employee import Employee
+
+
+class RevokedToken(models.Model):
+    class Meta:
+        verbose_name = _("已注销令牌")
+        verbose_name_plural = _("已注销令牌")
+
+    jti = models.CharField(max_length=255, unique=True, verbose_name=_("令牌ID"))
+    employee = models.ForeignKey(Employee, null=True, blank=True, on_delete=models.CASCADE, verbose_name=_("员工"))
+    # 令牌过期后记录即可清理，同步时只加载未过期的记录
+    expires_at = models.DateTimeField(db_index=True, verbose_name=_("过期时间"))
+    revoked_at = models.DateTimeField(auto_now_add=True, verbose_name=_("注销时间"))
+
+    def __str__(self):
+        return f'{self.jti}'
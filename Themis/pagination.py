@@ -0,0 +1,179 @@
+import hashlib
+import json
+import operator
+from functools import reduce
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination over ``id`` or one of the view's ``cursor_orderings``, selected with ``?ordering=``.
+
+    Other orderings are paired with ``id`` and pages are fetched with ``WHERE (key, id) > (last_key, last_id) LIMIT
+    n``, so deep pages cost the same as the first one even when many rows share a key. No ``COUNT(*)`` is issued
+    unless the client asks for ``?count=exact`` or the cheaper ``?count=approx``.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    # 近似计数在非 PostgreSQL 数据库上退化为带缓存的精确计数
+    approximate_count_timeout = 60
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = self.get_count(queryset, request)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse(self.ordering) if reverse else self.ordering))
+        if position is not None:
+            # 位置同时包含排序键和 id，每行唯一；CursorPagination 只比较第一个排序字段，
+            # 键值相同的行靠 offset 跳过，超过 offset_cutoff 后会重复或停止翻页
+            values = self.decode_position(position, queryset.model)
+            queryset = queryset.filter(self.keyset_filter(values, reverse))
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None or offset > 0
+            self.has_previous = following is not None
+            self.next_position, self.previous_position = position, following
+        else:
+            self.has_next = following is not None
+            self.has_previous = position is not None or offset > 0
+            self.next_position, self.previous_position = following, position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def keyset_filter(self, values, reverse):
+        """
+        ``(f1, f2, ...) > (v1, v2, ...)`` in the page direction, spelled out as ``f1 > v1 OR (f1 = v1 AND f2 > v2)``
+        since Django has no row value comparison.
+        """
+        conditions = []
+        for n, (order, value) in enumerate(zip(self.ordering, values)):
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            equal = {name.lstrip('-'): previous for name, previous in zip(self.ordering[:n], values)}
+            conditions.append(Q(**equal, **{f'{order.lstrip("-")}__{lookup}': value}))
+        return reduce(operator.or_, conditions)
+
+    def decode_position(self, position, model):
+        """The ordering values stored in a cursor position, converted to the field types."""
+        try:
+            values = json.loads(position) if len(self.ordering) > 1 else [position]
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(position)
+            return [model._meta.get_field(name.lstrip('-')).to_python(value)
+                    for name, value in zip(self.ordering, values)]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        values = [instance[name.lstrip('-')] if isinstance(instance, dict) else getattr(instance, name.lstrip('-'))
+                  for name in ordering]
+        return json.dumps([str(value) for value in values])
+
+    def get_ordering(self, request, queryset, view):
+        allowed = getattr(view, 'cursor_orderings', (self.ordering,))
+        ordering = request.query_params.get('ordering', self.ordering)
+        if ordering.lstrip('-') not in allowed:
+            raise ValidationError({'ordering': f'Must be one of {", ".join(allowed)}.'})
+        # 非唯一排序字段以 id 作为第二排序键，保证翻页结果稳定
+        if ordering.lstrip('-') == 'id':
+            return (ordering,)
+        return ordering, '-id' if ordering.startswith('-') else 'id'
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return approximate_count(queryset, self.approximate_count_timeout)
+        return None
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return response_schema
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Page number pagination that switches to ``KeysetPagination`` for requests with ``?pagination=keyset`` (and the
+    ``?cursor=`` links it returns), so existing clients keep ``?page=`` and ``count``.
+    """
+    keyset_class = KeysetPagination
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if params.get('pagination') != 'keyset' and self.keyset_class.cursor_query_param not in params:
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = self.keyset_class()
+        page = self.keyset.paginate_queryset(queryset, request, view)
+        self.display_page_controls = self.keyset.display_page_controls
+        return page
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.keyset is not None:
+            return self.keyset.to_html()
+        return super().to_html()
+
+
+def _reverse(ordering):
+    return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+
+def approximate_count(queryset, timeout):
+    """
+    Estimates the row count of ``queryset``: from the planner on PostgreSQL, otherwise an exact count that is cached
+    for ``timeout`` seconds per distinct query.
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.order_by().query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    # 内置 hash() 每个进程的种子不同，用 md5 才能在多个进程之间共享缓存
+    digest = hashlib.md5(json.dumps([sql, [str(param) for param in params]]).encode()).hexdigest()
+    key = f'approx-count:{digest}'
+    return cache.get_or_set(key, queryset.count, timeout)
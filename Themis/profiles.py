@@ -0,0 +1,66 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from Themis.models import Employee
+from Themis.serializers import EmployeeBasicInfoSerializer
+
+PROFILE_CARD_TIMEOUT = getattr(settings, 'PROFILE_CARD_TIMEOUT', 60 * 60)
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def profile_card_key(employee_id):
+    return f'profile-card:{employee_id}'
+
+
+def get_profile_card(employee_id):
+    """
+    The cached basic info of an employee (id, name, avatar, title, expertise, email). Built with a single joined query
+    on a miss; raises ``Employee.DoesNotExist`` for unknown ids.
+    """
+    key = profile_card_key(employee_id)
+    card = cache.get(key)
+    _count(card)
+    if card is None:
+        card = dict(EmployeeBasicInfoSerializer(_card_queryset().get(pk=employee_id)).data)
+        cache.set(key, card, PROFILE_CARD_TIMEOUT)
+    return card
+
+
+async def aget_profile_card(employee_id):
+    """Async ``get_profile_card`` for async views."""
+    key = profile_card_key(employee_id)
+    card = await cache.aget(key)
+    _count(card)
+    if card is None:
+        card = dict(EmployeeBasicInfoSerializer(await _card_queryset().aget(pk=employee_id)).data)
+        await cache.aset(key, card, PROFILE_CARD_TIMEOUT)
+    return card
+
+
+def _card_queryset():
+    return Employee.objects.select_related('position').only('id', 'name', 'avatar', 'email', 'expertise',
+                                                             'position__title')
+
+
+def _count(card):
+    with _stats_lock:
+        _stats['hits' if card is not None else 'misses'] += 1
+
+
+def invalidate_profile_cards(employee_ids):
+    """
+    Drops the cached cards once the current transaction commits; deleting them earlier lets a concurrent read cache
+    the uncommitted old row again.
+    """
+    keys = [profile_card_key(employee_id) for employee_id in employee_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def profile_card_stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,124 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from Themis.models import OA, Customer, PositionLevel, ProjectStatus, ProjectType
+
+# 本进程副本至多每隔该秒数与共享缓存中的版本号核对一次
+REFERENCE_CACHE_CHECK_INTERVAL = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 1)
+
+
+class ReferenceTable:
+    """
+    Process-local copy of a small lookup table. Each process keeps every row in memory and compares its copy with a
+    version counter in the shared cache at most every ``REFERENCE_CACHE_CHECK_INTERVAL`` seconds; saving or deleting
+    a row bumps the counter (see ``Themis.signals``) so every process reloads the table with a single query.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.label = model._meta.model_name
+        self.stats = {'hits': 0, 'misses': 0, 'reloads': 0}
+        self._rows = None
+        self._indexes = {}
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version_key(self):
+        return f'reference-version:{self.label}'
+
+    def rows(self):
+        """All rows keyed by primary key, reloaded if another process changed the table."""
+        rows = self._rows
+        if rows is not None and time.monotonic() - self._checked < REFERENCE_CACHE_CHECK_INTERVAL:
+            return rows
+        version = self.shared_version()
+        with self._lock:
+            if self._rows is None or version != self._version:
+                self._rows = {row.pk: row for row in self.model.objects.all()}
+                self._indexes = {}
+                self._version = version
+                self.stats['reloads'] += 1
+            self._checked = time.monotonic()
+            return self._rows
+
+    def get(self, pk):
+        """The row with primary key ``pk``, or None. Rows missing from the copy are looked up in the database."""
+        if pk is None:
+            return None
+        row = self.rows().get(pk)
+        self._count(row)
+        if row is None:
+            # 可能是其他进程刚创建、版本号尚未核对的行
+            row = self.model.objects.filter(pk=pk).first()
+        return row
+
+    def lookup(self, field, value):
+        """The first row whose ``field`` equals ``value``, or None, from an index built on first use."""
+        rows = self.rows()
+        index = self._indexes.get(field)
+        if index is None:
+            index = {}
+            for row in rows.values():
+                index.setdefault(getattr(row, field), row)
+            self._indexes[field] = index
+        row = index.get(value)
+        self._count(row)
+        return row
+
+    def all(self):
+        return list(self.rows().values())
+
+    def invalidate(self):
+        """Drops this process's copy and bumps the shared version so other processes reload too."""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, time.time_ns(), None)
+        with self._lock:
+            self._rows = None
+
+    def shared_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # 缓存被清空或过期时取一个新的版本号，使所有进程的副本失效
+            cache.add(self.version_key, time.time_ns(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _count(self, row):
+        with self._lock:
+            self.stats['hits' if row is not None else 'misses'] += 1
+
+
+areas = ReferenceTable(OA)
+position_levels = ReferenceTable(PositionLevel)
+project_types = ReferenceTable(ProjectType)
+project_statuses = ReferenceTable(ProjectStatus)
+customers = ReferenceTable(Customer)
+REFERENCE_TABLES = {table.model: table for table in (areas, position_levels, project_types, project_statuses,
+                                                     customers)}
+
+
+def reference_table(model):
+    return REFERENCE_TABLES.get(model)
+
+
+def warm_reference_tables():
+    for table in REFERENCE_TABLES.values():
+        table.rows()
+
+
+def reference_cache_stats():
+    return {table.label: dict(table.stats) for table in REFERENCE_TABLES.values()}
+
+
+def clear_reference_tables():
+    """Drops the copies of this process without touching the shared versions, e.g. between tests."""
+    for table in REFERENCE_TABLES.values():
+        with table._lock:
+            table._rows = None
@@ -0,0 +1,81 @@
+import re
+
+from django.db import transaction
+from pypinyin import Style, lazy_pinyin
+
+from Themis.models import Employee, EmployeeSearchTerm
+
+TERM_LENGTH = EmployeeSearchTerm._meta.get_field('term').max_length
+# 参与索引的员工字段，只有这些字段变化时才需要重建索引
+INDEXED_FIELDS = ('name', 'expertise', 'graduated_from', 'employee_number')
+SEPARATORS = re.compile(r'[\s,，、;；/|]+')
+# 前缀查询的上界：term >= q AND term < q + MAX_CHAR 可以走索引，LIKE 'q%' 在 SQLite 上不行
+MAX_CHAR = '\U0010ffff'
+
+
+def text_terms(text):
+    """
+    Every suffix of ``text`` with its full pinyin and pinyin initials, so a prefix lookup on the terms matches any
+    substring of the text as typed in Chinese, pinyin or initials.
+    """
+    text = text.strip().lower()
+    if not text:
+        return set()
+    chars = list(text)
+    syllables = lazy_pinyin(chars)
+    initials = lazy_pinyin(chars, style=Style.FIRST_LETTER)
+    terms = set()
+    for i in range(len(chars)):
+        terms.update((text[i:], ''.join(syllables[i:]), ''.join(initials[i:])))
+    return {term[:TERM_LENGTH] for term in terms if term.strip()}
+
+
+def search_terms(employee):
+    terms = text_terms(employee.name or '')
+    for text in (employee.expertise, employee.graduated_from):
+        for part in SEPARATORS.split(text or ''):
+            # 长文本只索引整段及其拼音，不展开所有后缀
+            part = part.strip().lower()
+            if part:
+                terms.update((part[:TERM_LENGTH], ''.join(lazy_pinyin(part))[:TERM_LENGTH],
+                              ''.join(lazy_pinyin(part, style=Style.FIRST_LETTER))[:TERM_LENGTH]))
+    if employee.employee_number:
+        terms.add(employee.employee_number.lower()[:TERM_LENGTH])
+    return terms
+
+
+def index_employees(employees, batch_size=1000):
+    employees = [employee for employee in employees if employee.pk]
+    rows = [EmployeeSearchTerm(employee_id=employee.pk, term=term)
+            for employee in employees for term in search_terms(employee)]
+    with transaction.atomic():
+        EmployeeSearchTerm.objects.filter(employee_id__in=[employee.pk for employee in employees]).delete()
+        EmployeeSearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def rebuild_index(batch_size=1000):
+    EmployeeSearchTerm.objects.all().delete()
+    batch = []
+    for employee in Employee.objects.only('id', *INDEXED_FIELDS).iterator(chunk_size=batch_size):
+        batch.append(employee)
+        if len(batch) == batch_size:
+            index_employees(batch, batch_size)
+            batch = []
+    index_employees(batch, batch_size)
+
+
+def search_employee_ids(query, limit=10):
+    """Ids of employees with a term starting with ``query``, in term order, found with one index range scan."""
+    query = query.strip().lower()[:TERM_LENGTH]
+    if not query or limit < 1:
+        return []
+    rows = EmployeeSearchTerm.objects.filter(term__gte=query, term__lt=query + MAX_CHAR) \
+        .order_by('term', 'employee_id').values_list('employee_id', flat=True)
+    ids = []
+    # 同一员工可能命中多个搜索词，多取一些后去重
+    for employee_id in rows[:limit * 8]:
+        if employee_id not in ids:
+            ids.append(employee_id)
+            if len(ids) == limit:
+                break
+    return ids
@@ -1,31 +1,202 @@
 from typing import Dict, Any
 
-from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, AuthUser
-from rest_framework_simplejwt.tokens import Token
+from rest_framework import permissions, serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, AuthUser, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import Token, RefreshToken
+
+from Themis.authentication import revocation_list
 
 from Themis.models import Employee
 from Themis.models import Project
+from Themis.models import Department
+from Themis.models import Task
+from Themis.images import THUMBNAIL_SIZES, thumbnail_exists, thumbnail_name
+from Themis.reference import reference_table
+
+
+class SparseFieldsMixin:
+    """
+    Restricts the serialized fields to the comma separated ``?fields=`` query parameter of the request in context.
+    Only read requests are trimmed; writes always accept and return every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = sparse_fields(self.context.get('request'))
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+def sparse_fields(request):
+    # 写请求若裁剪字段，未列出的可写字段会被静默丢弃
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return set()
+    value = request.query_params.get('fields', '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class ThumbnailsField(serializers.Field):
+    """Read-only map of thumbnail size to URL for an image field; falls back to the image itself until generated."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for size in THUMBNAIL_SIZES:
+            # 缩略图在后台生成，生成之前（以及尚未回填的旧图片）返回原图
+            name = thumbnail_name(value.name, size) if thumbnail_exists(value.name, size) else value.name
+            url = value.storage.url(name)
+            urls[str(size)] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+class ReferenceField(serializers.Field):
+    """
+    Read-only attribute of a reference row (area, level, project type/status, customer), resolved from the
+    process-local tables of ``Themis.reference`` instead of a join. ``source`` is the foreign key column.
+    """
+
+    def __init__(self, attr, **kwargs):
+        self.attr = attr
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def bind(self, field_name, parent):
+        super().bind(field_name, parent)
+        self.table = reference_table(parent.Meta.model._meta.get_field(self.source).related_model)
+
+    def to_representation(self, value):
+        row = self.table.get(value)
+        return getattr(row, self.attr) if row is not None else None
+
+
+class ReferenceRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key relation resolved without a query per field: ids of reference tables come from memory and, during
+    batch writes, other ids from the objects preloaded into ``context['preloaded']`` by ``Themis.batch``.
+    """
+
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        rows = self.context.get('preloaded', {}).get(model)
+        table = reference_table(model)
+        if (rows is None and table is None) or self.pk_field is not None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        row = rows.get(pk) if rows is not None else table.get(pk)
+        if row is None:
+            self.fail('does_not_exist', pk_value=data)
+        return row
 
 
 class ProjectSerializer(serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
+    snapshot_thumbnails = ThumbnailsField(source='snapshot')
+
     class Meta:
         model = Project
         fields = '__all__'
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeBriefSerializer(serializers.ModelSerializer):
     class Meta:
         model = Employee
+        fields = ('id', 'name')
+
+
+class ProjectDashboardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
+    snapshot_thumbnails = ThumbnailsField(source='snapshot')
+    area_name = ReferenceField('OA_name', source='area_id')
+    PM_name = serializers.CharField(source='PM.name', read_only=True, allow_null=True)
+    BM_name = serializers.CharField(source='BM.name', read_only=True, allow_null=True)
+    type_name = ReferenceField('type', source='type_id')
+    status_name = ReferenceField('status', source='status_id')
+    customer_name = ReferenceField('name', source='customer_id')
+    watched_by = EmployeeBriefSerializer(many=True, read_only=True)
+    # 以下字段由 ProjectViewSet 在 SQL 中注解
+    open_tasks = serializers.IntegerField(read_only=True)
+    overdue_tasks = serializers.IntegerField(read_only=True)
+    completed_tasks = serializers.IntegerField(read_only=True)
+    days_until_completion = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Project
+        fields = ('id', 'code', 'name', 'snapshot', 'snapshot_thumbnails', 'area', 'area_name', 'PM', 'PM_name', 'BM',
+                  'BM_name', 'type', 'type_name', 'status', 'status_name', 'customer', 'customer_name',
+                  'initiation_date', 'completion_date_est', 'watched_by', 'open_tasks', 'overdue_tasks',
+                  'completed_tasks', 'days_until_completion')
+
+    def get_days_until_completion(self, obj):
+        remaining = getattr(obj, 'days_until_completion', None)
+        return remaining.days if remaining is not None else None
+
+
+class ProjectFeedSerializer(ProjectDashboardSerializer):
+    # ProjectViewSet.feed 只预取当前员工的成员记录
+    roles = serializers.SerializerMethodField()
+
+    class Meta(ProjectDashboardSerializer.Meta):
+        fields = ProjectDashboardSerializer.Meta.fields + ('roles',)
+
+    def get_roles(self, obj):
+        return sorted(membership.role for membership in getattr(obj, 'my_memberships', []))
+
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
+
+    class Meta:
+        model = Task
         fields = '__all__'
 
 
+class EmployeeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_related_field = ReferenceRelatedField
+
+    class Meta:
+        model = Employee
+        fields = '__all__'
+
+
+class EmployeeListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # 列表页只返回展示所需字段，不包含薪资、银行卡等敏感信息
+    title = serializers.CharField(source='position.title', read_only=True, allow_null=True)
+    department = serializers.CharField(source='position.department.department', read_only=True, allow_null=True)
+    level = ReferenceField('level', source='position_level_id')
+    avatar_thumbnails = ThumbnailsField(source='avatar')
+
+    class Meta:
+        model = Employee
+        fields = ('id', 'name', 'employee_number', 'avatar', 'avatar_thumbnails', 'email', 'phone', 'gender', 'status',
+                  'expertise', 'work_place', 'date_joined', 'title', 'department', 'level')
+
+
+class DepartmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Department
+        fields = ('id', 'department', 'area', 'director', 'parent_department', 'depth')
+
+
 class EmployeeBasicInfoSerializer(serializers.ModelSerializer):
     title = serializers.SerializerMethodField()
+    avatar_thumbnails = ThumbnailsField(source='avatar')
 
     class Meta:
         model = Employee
-        fields = ('id', 'name', 'avatar', 'email', 'title', 'expertise')
+        fields = ('id', 'name', 'avatar', 'avatar_thumbnails', 'email', 'title', 'expertise')
 
     def get_title(self, obj):
         return obj.position.title if obj.position else None
@@ -35,26 +206,31 @@ class LoginSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user: AuthUser) -> Token:
         token = super().get_token(user)
-        user_info = {
-            'id': getattr(user, 'id', None),
-            'name': getattr(user, 'name', None),
-            'avatar': user.avatar.url if user.avatar else None,
-            'position': user.position.title if user.position else None,
-            'expertise': getattr(user, 'expertise', None),
-            'email': getattr(user, 'email', None)
-        }
-        token['user'] = user_info
+        token['user'] = user_info(user)
         return token
 
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, str]:
         data = super().validate(attrs)
-        user_info = {
-            'id': getattr(self.user, 'id', None),
-            'name': getattr(self.user, 'name', None),
-            'avatar': self.user.avatar.url if self.user.avatar else None,
-            'position': self.user.position.title if self.user.position else None,
-            'expertise': getattr(self.user, 'expertise', None),
-            'email': getattr(self.user, 'email', None)
-        }
-        data.update({'user_info': user_info})
+        data.update({'user_info': user_info(self.user)})
         return data
+
+
+class RefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, str]:
+        if revocation_list.is_revoked(RefreshToken(attrs['refresh'])):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
+
+
+def user_info(user):
+    from Themis.profiles import get_profile_card
+
+    card = get_profile_card(user.pk)
+    return {
+        'id': card['id'],
+        'name': card['name'],
+        'avatar': card['avatar'],
+        'position': card['title'],
+        'expertise': card['expertise'],
+        'email': card['email']
+    }
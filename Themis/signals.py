@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F, Q
+from django.db.models.functions import Substr
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from Themis.feed import sync_dri_roles, sync_manager_roles, sync_watchers
+from Themis.middleware import instrument
+from Themis.models import (OA, Customer, Department, Employee, Position, PositionLevel, Project, ProjectStatus,
+                           ProjectType, Task)
+from Themis.profiles import invalidate_profile_cards
+from Themis.reference import REFERENCE_TABLES
+from Themis.search import INDEXED_FIELDS, index_employees
+
+
+@receiver(post_delete, sender=Department)
+def rebase_orphaned_departments(sender, instance, **kwargs):
+    # 上级部门删除后（SET_NULL），其下级部门成为新的根节点
+    if instance.path:
+        Department.objects.filter(path__startswith=instance.path).update(
+            path=Substr('path', len(instance.path)), depth=F('depth') - instance.depth - 1)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def invalidate_employee_profile_card(sender, instance, **kwargs):
+    invalidate_profile_cards([instance.pk])
+
+
+@receiver(post_save, sender=Employee)
+def index_employee(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(INDEXED_FIELDS) & set(update_fields)):
+        return
+    index_employees([instance])
+
+
+@receiver(post_save, sender=Position)
+@receiver(pre_delete, sender=Position)
+def invalidate_position_profile_cards(sender, instance, **kwargs):
+    # 删除岗位前收集员工，删除后外键已被置空
+    invalidate_profile_cards(Employee.objects.filter(position=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Project)
+def sync_project_manager_roles(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'PM', 'BM'} & set(update_fields)):
+        return
+    sync_manager_roles(instance)
+
+
+@receiver(m2m_changed, sender=Project.watched_by.through)
+def sync_project_watchers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # clear 之后拿不到被移除的对象，因此在清除前处理
+        related = instance.watched_projects if reverse else instance.watched_by
+        pk_set = set(related.values_list('pk', flat=True))
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+    project_ids, employee_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    sync_watchers(project_ids, employee_ids, added=action == 'post_add')
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_project(sender, instance, raw=False, update_fields=None, **kwargs):
+    # 任务可能被移到其他项目，保存前记下原项目以便同步；新建或未保存 project 字段时无需查询
+    instance._previous_project_id = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'project', 'project_id'} & set(update_fields):
+        return
+    instance._previous_project_id = Task.objects.filter(pk=instance.pk).values_list('project_id', flat=True).first()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def sync_task_dri_roles(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'DRI', 'DRI_id', 'project', 'project_id'} & set(update_fields)):
+        return
+    sync_dri_roles({instance.project_id, getattr(instance, '_previous_project_id', None)})
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_reference_table(sender, **kwargs):
+    table = REFERENCE_TABLES.get(sender)
+    if table is not None:
+        # 提交后再更新版本号，否则其他进程可能在提交前读到旧数据并缓存到新版本号下
+        transaction.on_commit(table.invalidate)
+
+
+def touch(queryset):
+    """
+    Bumps ``updated_at`` on the rows of ``queryset``. Lists render names of related rows and task counts, so those
+    changes have to move the ETag/Last-Modified validators of the rows that show them.
+    """
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Position)
+@receiver(pre_delete, sender=Position)
+def touch_position_employees(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch(Employee.objects.filter(position=instance))
+
+
+@receiver(post_save, sender=Department)
+@receiver(pre_delete, sender=Department)
+def touch_department_employees(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch(Employee.objects.filter(position__department=instance))
+
+
+@receiver(post_save, sender=PositionLevel)
+@receiver(pre_delete, sender=PositionLevel)
+def touch_position_level_employees(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch(Employee.objects.filter(position_level=instance))
+
+
+@receiver(post_save, sender=Employee)
+def touch_employee_projects(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # 项目列表展示 PM/BM/关注人的姓名
+    if raw or created or (update_fields is not None and 'name' not in update_fields):
+        return
+    touch(Project.objects.filter(Q(PM=instance) | Q(BM=instance) | Q(watched_by=instance)).distinct())
+
+
+@receiver(m2m_changed, sender=Employee.groups.through)
+@receiver(m2m_changed, sender=Employee.user_permissions.through)
+def touch_employee_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    # 员工详情展示 groups 与 user_permissions
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch(Employee.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        field = 'groups' if sender is Employee.groups.through else 'user_permissions'
+        touch(Employee.objects.filter(**{field: instance}))
+    elif pk_set:
+        touch(Employee.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=OA)
+@receiver(pre_delete, sender=OA)
+def touch_area_projects(sender, instance, raw=False, **kwargs):
+    if not raw:
+        touch(Project.objects.filter(area=instance))
+
+
+@receiver(post_save, sender=ProjectType)
+@receiver(pre_delete, sender=ProjectType)
+@receiver(post_save, sender=ProjectStatus)
+@receiver(pre_delete, sender=ProjectStatus)
+@receiver(post_save, sender=Customer)
+@receiver(pre_delete, sender=Customer)
+def touch_reference_projects(sender, instance, raw=False, **kwargs):
+    if not raw:
+        field = {ProjectType: 'type', ProjectStatus: 'status', Customer: 'customer'}[sender]
+        touch(Project.objects.filter(**{field: instance}))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def touch_task_projects(sender, instance, raw=False, **kwargs):
+    # 项目的任务统计随任务变化
+    if not raw:
+        touch(Project.objects.filter(pk__in={instance.project_id, getattr(instance, '_previous_project_id', None)}
+                                     - {None}))
+
+
+@receiver(m2m_changed, sender=Project.watched_by.through)
+def touch_watched_projects(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch(Project.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        touch(instance.watched_projects.all())
+    elif pk_set:
+        touch(Project.objects.filter(pk__in=pk_set))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrument(connection)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
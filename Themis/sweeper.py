@@ -0,0 +1,36 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from Themis.models import JobWatermark, Project, Task
+
+OVERDUE_WATERMARK = 'overdue-tasks'
+# 已完成、已取消和已标记逾期的任务不再处理
+SETTLED_STATUSES = (Task.STATUS_CHOICES.COMPLETED, Task.STATUS_CHOICES.CANCELLED, Task.STATUS_CHOICES.DELAYED)
+# 按 updated_at 扫描时向前多看的时间，覆盖上次扫描时尚未提交的写入
+WATERMARK_OVERLAP = datetime.timedelta(minutes=1)
+
+
+def sweep_overdue_tasks(now=None, full=False):
+    """
+    Marks open tasks whose deadline passed since the previous sweep as delayed with a single UPDATE and advances the
+    watermark. Tasks written since the previous sweep are checked too, since they may have been created, reopened or
+    moved with a deadline already behind the watermark. ``full`` rescans every past deadline. Returns the number of
+    tasks marked.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        marker, _ = JobWatermark.objects.select_for_update().get_or_create(name=OVERDUE_WATERMARK)
+        overdue = Task.objects.filter(deadline__lt=now)
+        if marker.watermark and not full:
+            overdue = overdue.filter(Q(deadline__gte=marker.watermark) |
+                                     Q(updated_at__gte=marker.watermark - WATERMARK_OVERLAP))
+        overdue = overdue.exclude(status__in=SETTLED_STATUSES)
+        # update() 跳过 auto_now 和信号，手动刷新任务及其项目的 updated_at
+        Project.objects.filter(pk__in=overdue.values('project_id')).update(updated_at=now)
+        swept = overdue.update(status=Task.STATUS_CHOICES.DELAYED, updated_at=now)
+        marker.watermark = max(now, marker.watermark) if marker.watermark else now
+        marker.save(update_fields=['watermark'])
+    return swept
@@ -1,3 +1,1380 @@
-from django.test import TestCase
+import csv
+import datetime
+import functools
+import json
+import multiprocessing
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Themis import authentication, images, metrics, reference
+from Themis.authentication import cached_employee, revocation_list
+from Themis.management.commands.initial_password import INITIAL_PASSWORD
+from Themis.models import OA, Department, Employee, JobWatermark, Position, PositionLevel, Project, \
+    ProjectCodeSequence, ProjectMembership, ProjectStatus, ProjectType, Customer, Task
+from Themis.profiles import profile_card_key
+from Themis.serializers import EmployeeBasicInfoSerializer, ProjectSerializer
+from Themis.sweeper import OVERDUE_WATERMARK, sweep_overdue_tasks
+
+
+class ProjectCodeSequenceTests(TestCase):
+    def test_reserve_block_is_consecutive(self):
+        date = datetime.date(2024, 5, 1)
+        self.assertEqual(ProjectCodeSequence.reserve('SH', date), ['SH-20240501-001'])
+        self.assertEqual(ProjectCodeSequence.reserve('SH', date, count=3),
+                         ['SH-20240501-002', 'SH-20240501-003', 'SH-20240501-004'])
+        self.assertEqual(ProjectCodeSequence.reserve('BJ', date), ['BJ-20240501-001'])
+
+    def test_save_generates_code(self):
+        area = OA.objects.create(OA_name='华东', OA_code='SH')
+        project = Project.objects.create(name='p', area=area, initiation_date=datetime.date(2024, 5, 1))
+        self.assertEqual(project.code, 'SH-20240501-001')
+        self.assertEqual(project.completion_date_est, datetime.date(2024, 7, 30))
+
+
+class ProjectCodeConcurrencyTests(TransactionTestCase):
+    threads = 8
+    projects_per_thread = 10
+
+    def test_concurrent_creates_get_unique_codes(self):
+        area = OA.objects.create(OA_name='华东', OA_code='SH')
+        date = datetime.date(2024, 5, 1)
+
+        def create_projects(n):
+            try:
+                return [Project.objects.create(name=f'p{n}-{i}', area=area, initiation_date=date).code
+                        for i in range(self.projects_per_thread)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            codes = [code for batch in pool.map(create_projects, range(self.threads)) for code in batch]
+
+        total = self.threads * self.projects_per_thread
+        self.assertEqual(len(set(codes)), total)
+        self.assertEqual(sorted(codes), [f'SH-20240501-{n:03d}' for n in range(1, total + 1)])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    """
+    Every API route must issue a fixed number of queries whatever the page size or the number of related rows, so
+    an N+1 introduced by a serializer or queryset change fails here with the offending SQL.
+    """
+    page_sizes = (1, 5, 25)
+    employees = 30
+    projects = 30
+    tasks_per_project = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        area = OA.objects.create(OA_name='华东', OA_code='SH')
+        root = Department.objects.create(department='总部', area=area)
+        child = Department.objects.create(department='研发', area=area, parent_department=root)
+        Department.objects.create(department='测试', area=area, parent_department=child)
+        positions = [Position.objects.create(department=department, title=f'岗位{department.pk}')
+                     for department in Department.objects.all()]
+        level = PositionLevel.objects.create(level='P5', type='技术')
+        cls.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                employee_number='E0000', phone='13800000000',
+                                                position=positions[0], position_level=level)
+        employees = [Employee.objects.create(username=f'user{n}', name=f'员工{n}', employee_number=f'E{n:04d}',
+                                             phone='13800000000', position=positions[n % len(positions)],
+                                             position_level=level, expertise='数据分析')
+                     for n in range(1, cls.employees)]
+        project_type = ProjectType.objects.create(type='咨询')
+        project_status = ProjectStatus.objects.create(status='执行')
+        customer = Customer.objects.create(name='客户', location='上海')
+        deadline = timezone.now() - datetime.timedelta(days=1)
+        for n in range(cls.projects):
+            bm = employees[n % len(employees)]
+            project = Project.objects.create(name=f'项目{n}', area=area, PM=cls.user, BM=bm,
+                                             type=project_type, status=project_status, customer=customer,
+                                             initiation_date=datetime.date(2024, 5, 1))
+            project.watched_by.add(cls.user, *employees[n:n + 3])
+            parent = None
+            for i in range(cls.tasks_per_project):
+                parent = Task.objects.create(title=f'任务{n}-{i}', project=project, DRI=employees[i],
+                                             allocator=cls.user, deadline=deadline, parent_task=parent)
+        cls.project = Project.objects.order_by('id').first()
+        cls.task = Task.objects.filter(parent_task=None).order_by('id').first()
+        cls.department = root
+
+    def setUp(self):
+        cache.clear()
+        # 注销列表按间隔从数据库同步，先同步一次使其不计入各请求的查询数
+        revocation_list.sync(force=True)
+        # 参考数据表在进程内常驻，同样预先加载
+        reference.clear_reference_tables()
+        reference.warm_reference_tables()
+        self.client = APIClient()
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def assertQueryBudget(self, budget, method, url, data=None, status=200, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, **kwargs)
+        self.assertEqual(response.status_code, status, f'{method.upper()} {url}: {response.content[:500]!r}')
+        if len(queries) != budget:
+            sql = '\n'.join(f'{n}. {query["sql"]}' for n, query in enumerate(queries.captured_queries, 1))
+            self.fail(f'{method.upper()} {url} ran {len(queries)} queries, budget is {budget}:\n{sql}')
+        return response
+
+    def assertPagedBudget(self, budget, url):
+        for page_size in self.page_sizes:
+            with self.subTest(page_size=page_size):
+                separator = '&' if '?' in url else '?'
+                response = self.assertQueryBudget(budget, 'get', f'{url}{separator}page_size={page_size}')
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_employee_list(self):
+        # 默认仍为页码分页，带 count
+        response = self.assertQueryBudget(3, 'get', '/api/employees/?page=2')
+        self.assertEqual(response.data['count'], self.employees)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertPagedBudget(2, '/api/employees/?pagination=keyset')
+        self.assertPagedBudget(2, '/api/employees/?pagination=keyset&ordering=-date_joined')
+        self.assertPagedBudget(3, '/api/employees/?pagination=keyset&count=exact')
+
+    def test_employee_detail(self):
+        # groups 与 user_permissions 各预取一次
+        self.assertQueryBudget(4, 'get', f'/api/employees/{self.user.pk}/')
+
+    def test_employee_search(self):
+        response = self.assertQueryBudget(2, 'get', '/api/employees/search/?q=yg&limit=25')
+        self.assertEqual(len(response.data), 25)
+
+    def test_employee_basic_info(self):
+        self.assertQueryBudget(1, 'get', f'/api/employees/{self.user.pk}/basicInfo/')
+        self.assertQueryBudget(0, 'get', f'/api/employees/{self.user.pk}/basicInfo/')
+
+    def test_token(self):
+        self.client.credentials()
+        self.assertQueryBudget(2, 'post', '/api/token/', {'username': 'admin', 'password': 'secret'})
+        self.assertQueryBudget(1, 'post', '/api/token/refresh/', {'refresh': str(self.refresh)})
+
+    def test_token_revoke(self):
+        # access 与 refresh 令牌各一次 get_or_create（查询、保存点、插入、释放）
+        self.assertQueryBudget(8, 'post', '/api/token/revoke/', {'refresh': str(self.refresh)}, status=204)
+
+    def test_uploads(self):
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8)).save(buffer, format='PNG')
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        # 缩略图在后台线程生成且不查询数据库，这里不提交，避免线程在设置恢复后写入真实的 MEDIA_ROOT
+        with override_settings(MEDIA_ROOT=media_root), mock.patch('Themis.views.Employee.views.schedule_thumbnails'):
+            for url, key in ((f'/api/employees/{self.user.pk}/avatar/', 'avatar'),
+                             (f'/api/projects/{self.project.pk}/snapshot/', 'snapshot')):
+                upload = SimpleUploadedFile('image.png', buffer.getvalue(), content_type='image/png')
+                self.assertQueryBudget(2, 'post', url, {key: upload}, format='multipart')
+
+    def test_departments(self):
+        self.assertQueryBudget(2, 'get', '/api/departments/')
+        self.assertQueryBudget(1, 'get', f'/api/departments/{self.department.pk}/')
+        self.assertQueryBudget(3, 'get', f'/api/departments/{self.department.pk}/subtree/')
+        self.assertQueryBudget(4, 'get', f'/api/departments/{self.department.pk}/subtree/?employees=1')
+
+    def test_project_list(self):
+        self.assertPagedBudget(3, '/api/projects/')
+
+    def test_project_detail(self):
+        self.assertQueryBudget(3, 'get', f'/api/projects/{self.project.pk}/')
+
+    def test_project_feed(self):
+        self.assertPagedBudget(3, '/api/projects/feed/')
+
+    def test_task_list(self):
+        self.assertPagedBudget(2, '/api/tasks/')
+        self.assertPagedBudget(2, f'/api/tasks/?status=todo&DRI={self.user.pk + 1}')
+
+    def test_task_detail(self):
+        self.assertQueryBudget(2, 'get', f'/api/tasks/{self.task.pk}/')
+
+    def test_task_rollup(self):
+        projects = ','.join(str(pk) for pk in Project.objects.values_list('pk', flat=True))
+        self.assertQueryBudget(1, 'get', f'/api/tasks/rollup/?project={projects}')
+
+    def test_task_tree(self):
+        self.assertQueryBudget(1, 'get', f'/api/tasks/{self.task.pk}/tree/')
+
+    def test_conditional_get(self):
+        for url in ('/api/employees/?page_size=5', f'/api/employees/{self.user.pk}/', '/api/projects/?page_size=5',
+                    f'/api/projects/{self.project.pk}/', '/api/tasks/?page_size=5', f'/api/tasks/{self.task.pk}/'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                # 验证器一致时只执行聚合查询，不取数据也不序列化
+                self.assertQueryBudget(1, 'get', url, status=304, headers={'If-None-Match': etag})
+
+    def test_conditional_get_changes(self):
+        url = f'/api/projects/{self.project.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.task.title = '新标题'
+        self.task.save()
+        # 任务变化会刷新所属项目的 updated_at
+        self.assertNotEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        url = '/api/employees/?page_size=5'
+        etag = self.client.get(url)['ETag']
+        position = self.user.position
+        position.title = '新岗位'
+        position.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_get_permissions(self):
+        url = f'/api/employees/{self.user.pk}/'
+        group = Group.objects.create(name='财务')
+        permission = Permission.objects.get(codename='view_task')
+        changes = (lambda: self.user.groups.add(group), lambda: self.user.user_permissions.add(permission),
+                   lambda: permission.employee_permissions.remove(self.user), lambda: group.employee_groups.clear())
+        for change in changes:
+            etag = self.client.get(url)['ETag']
+            change()
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_basic_info_invalidated_on_commit(self):
+        url = f'/api/employees/{self.user.pk}/basicInfo/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/employees/batch/', [{'id': self.user.pk, 'name': '新名字'}], format='json')
+            self.assertEqual(self.client.get(url).json()['name'], '管理员')
+        self.assertEqual(self.client.get(url).json()['name'], '新名字')
+
+    def test_basic_info_etag(self):
+        url = f'/api/employees/{self.user.pk}/basicInfo/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+
+class ReferenceCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.area = OA.objects.create(OA_name='华东', OA_code='SH')
+        cls.project_type = ProjectType.objects.create(type='咨询')
+        cls.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                phone='13800000000')
+        cls.project = Project.objects.create(name='项目', area=cls.area, type=cls.project_type,
+                                             initiation_date=datetime.date(2024, 5, 1))
+        cls.token = RefreshToken.for_user(cls.user).access_token
+
+    def setUp(self):
+        cache.clear()
+        reference.clear_reference_tables()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_tables_load_once(self):
+        before = reference.reference_cache_stats()['oa']
+        with self.assertNumQueries(len(reference.REFERENCE_TABLES)):
+            reference.warm_reference_tables()
+        with self.assertNumQueries(0):
+            self.assertEqual(reference.areas.get(self.area.pk).OA_name, '华东')
+            self.assertEqual(reference.areas.lookup('OA_code', 'SH'), self.area)
+            self.assertIsNone(reference.areas.lookup('OA_code', 'BJ'))
+        stats = reference.reference_cache_stats()['oa']
+        self.assertEqual(stats['hits'] - before['hits'], 2)
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+
+    def test_save_invalidates(self):
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.pk}/').data['area_name'], '华东')
+        version = reference.areas.shared_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.area.OA_name = '华北'
+            self.area.save()
+            # 提交前不更新版本号，其他进程不会把未提交的旧数据缓存到新版本号下
+            self.assertEqual(reference.areas.shared_version(), version)
+        self.assertNotEqual(reference.areas.shared_version(), version)
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.pk}/').data['area_name'], '华北')
+
+    def test_shared_version_change_reloads(self):
+        reference.project_types.rows()
+        # 模拟其他进程修改了表：绕过信号直接写库，再递增共享版本号
+        ProjectType.objects.filter(pk=self.project_type.pk).update(type='审计')
+        cache.incr(reference.project_types.version_key)
+        with mock.patch('Themis.reference.REFERENCE_CACHE_CHECK_INTERVAL', 0):
+            self.assertEqual(reference.project_types.get(self.project_type.pk).type, '审计')
+
+    def test_write_validates_from_memory(self):
+        reference.warm_reference_tables()
+        serializer = ProjectSerializer(data={'name': '新项目', 'area': self.area.pk, 'type': self.project_type.pk,
+                                             'watched_by': [self.user.pk], 'initiation_date': '2024-05-01'})
+        # 只有关注人需要查询，区域和项目类型从内存校验
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['area'], self.area)
+        serializer = ProjectSerializer(data={'name': '新项目', 'area': self.area.pk + 100,
+                                             'initiation_date': '2024-05-01'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('area', serializer.errors)
+
+    def test_metrics(self):
+        reference.areas.get(self.area.pk)
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('olympus_reference_cache_total{table="oa",result="reloads"}', body)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        area = OA.objects.create(OA_name='华东', OA_code='SH')
+        department = Department.objects.create(department='研发', area=area)
+        position = Position.objects.create(department=department, title='工程师')
+        cls.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                employee_number='E0000', phone='13800000000', position=position)
+        Employee.objects.create(username='user1', name='员工1', employee_number='E0001', phone='13800000000')
+        project = Project.objects.create(name='项目', area=area, PM=cls.user, initiation_date=datetime.date(2024, 5, 1))
+        project.watched_by.add(cls.user)
+        Task.objects.create(title='任务1', project=project, DRI=cls.user, status='todo',
+                            deadline=timezone.now())
+        Task.objects.create(title='任务2', project=project, status='completed')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_csv(self):
+        response = self.client.get('/api/employees/export.csv/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        with self.assertNumQueries(1):
+            rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[0][:3], ['ID', '工号', '姓名'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][4:7], ['华东', '研发', '工程师'])
+
+    def test_filters(self):
+        response = self.client.get('/api/tasks/export.csv/?status=todo')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual([row[3] for row in rows[1:]], ['任务1'])
+
+    def test_xlsx(self):
+        response = self.client.get('/api/tasks/export.xlsx/')
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0][:4], ('ID', '项目编号', '项目名称', '任务'))
+        self.assertEqual(len(rows), 3)
+        self.assertIsInstance(rows[1][8], datetime.datetime)
+
+    def test_formula_cells(self):
+        Employee.objects.create(username='user2', name='=HYPERLINK("http://x")', expertise='@SUM(A1)',
+                                employee_number='-1', phone='13800000000')
+        response = self.client.get('/api/employees/export.csv/')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[-1][1:3], ["'-1", '\'=HYPERLINK("http://x")'])
+        self.assertEqual(rows[-1][21], "'@SUM(A1)")
+        self.assertEqual(rows[1][2], '管理员')
+
+    async def test_asgi(self):
+        client = AsyncClient()
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        # 每行一个数据块，确认逐块生成而不是整体读入内存后再发送
+        with mock.patch('Themis.exports.ROWS_PER_CHUNK', 1):
+            response = await client.get('/api/tasks/export.csv/', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response]
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.reader(b''.join(chunks).decode('utf-8-sig').splitlines()))
+        self.assertEqual([row[3] for row in rows[1:]], ['任务1', '任务2'])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_data', 'projects', stdout=out)
+        self.assertIn('项目', out.getvalue())
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/employees.xlsx'
+            call_command('export_data', 'employees', file_format='xlsx', output=path, chunk_size=1,
+                         stdout=StringIO())
+            self.assertEqual(load_workbook(path).active.max_row, 3)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BatchWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        area = OA.objects.create(OA_name='华东', OA_code='SH')
+        department = Department.objects.create(department='研发', area=area)
+        cls.positions = [Position.objects.create(department=department, title=title) for title in ('工程师', '经理')]
+        cls.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                employee_number='E0000', phone='13800000000', id_number='1' * 18)
+        cls.employees = [Employee.objects.create(username=f'user{n}', name=f'员工{n}', phone='13800000000')
+                         for n in range(3)]
+        cls.project = Project.objects.create(name='项目', initiation_date=datetime.date(2024, 5, 1))
+        cls.project.watched_by.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        revocation_list.sync(force=True)
+        reference.clear_reference_tables()
+        reference.warm_reference_tables()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def tasks(self, count, **extra):
+        return [{'title': f'任务{n}', 'project': self.project.pk, 'DRI': self.employees[n % 3].pk,
+                 'allocator': self.user.pk, **extra} for n in range(count)]
+
+    def test_create_tasks(self):
+        queries = []
+        for count in (5, 50):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post('/api/tasks/batch/', self.tasks(count), format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertEqual([item['status'] for item in response.data], [201] * count)
+            queries.append(len(captured))
+        # 查询数与条目数无关
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(Task.objects.count(), 55)
+        self.assertEqual(set(ProjectMembership.objects.filter(role='DRI').values_list('employee_id', flat=True)),
+                         {employee.pk for employee in self.employees})
+
+    def test_partial_failure(self):
+        items = self.tasks(3)
+        items[1]['project'] = self.project.pk + 100
+        items[2]['status'] = 'unknown'
+        response = self.client.post('/api/tasks/batch/', items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['status'] for item in response.data], [201, 400, 400])
+        self.assertIn('project', response.data[1]['errors'])
+        self.assertIn('status', response.data[2]['errors'])
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_atomic(self):
+        items = self.tasks(3)
+        items[1]['DRI'] = 0
+        response = self.client.post('/api/tasks/batch/?atomic=true', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([item['status'] for item in response.data], [424, 400, 424])
+        self.assertFalse(Task.objects.exists())
+
+    def test_update_employees(self):
+        items = [{'id': employee.pk, 'position': self.positions[1].pk} for employee in self.employees]
+        items.append({'id': 0, 'name': '无'})
+        items.append({'id': self.employees[0].pk, 'username': 'admin'})
+        items.append({'id': self.employees[1].pk, 'id_number': '2' * 18})
+        items.append({'id': self.employees[2].pk, 'id_number': '2' * 18})
+        response = self.client.patch('/api/employees/batch/', items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['status'] for item in response.data], [200, 200, 200, 404, 400, 200, 400])
+        self.assertIn('username', response.data[4]['errors'])
+        self.assertIn('id_number', response.data[6]['errors'])
+        self.assertEqual(Employee.objects.filter(position=self.positions[1]).count(), 3)
+        self.assertEqual(Employee.objects.get(pk=self.employees[1].pk).id_number, '2' * 18)
+
+    def test_rename_refreshes_search_and_projects(self):
+        before = Project.objects.get(pk=self.project.pk).updated_at
+        response = self.client.patch('/api/employees/batch/', [{'id': self.user.pk, 'name': '张三'}], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.client.get('/api/employees/search/?q=zs').data[0]['id'], self.user.pk)
+        self.assertGreater(Project.objects.get(pk=self.project.pk).updated_at, before)
+
+    def test_many_to_many_only_update_moves_etag(self):
+        group = Group.objects.create(name='审计')
+        employee = self.employees[0]
+        Employee.objects.filter(pk=employee.pk).update(updated_at=timezone.now() - datetime.timedelta(days=1))
+        url = f'/api/employees/{employee.pk}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch('/api/employees/batch/', [{'id': employee.pk, 'groups': [group.pk]}],
+                                     format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['groups'], [group.pk])
+
+    def test_update_many_to_many(self):
+        groups = [Group.objects.create(name=name) for name in ('审计', '税务')]
+        self.employees[0].groups.add(groups[0])
+        employees = self.employees + [Employee.objects.create(username=f'user{n}', name=f'员工{n}',
+                                                              phone='13800000000') for n in range(3, 6)]
+        queries = []
+        for count in (2, 6):
+            items = [{'id': employee.pk, 'groups': [group.pk for group in groups[:n % 3]]}
+                     for n, employee in enumerate(employees[:count])]
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.patch('/api/employees/batch/', items, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            queries.append(len(captured))
+        # 中间表按字段整体写入，查询数与条目数无关
+        self.assertEqual(queries[0], queries[1])
+        for n, employee in enumerate(employees):
+            self.assertEqual(set(employee.groups.values_list('pk', flat=True)), {group.pk for group in groups[:n % 3]})
+
+    def test_update_string_ids(self):
+        response = self.client.patch('/api/employees/batch/', [{'id': str(self.employees[0].pk), 'name': '张三'},
+                                                                {'id': 'x', 'name': '李四'}], format='json')
+        self.assertEqual([item['status'] for item in response.data], [200, 404])
+        self.assertEqual(Employee.objects.get(pk=self.employees[0].pk).name, '张三')
+
+    def test_rejects_non_list(self):
+        self.assertEqual(self.client.post('/api/tasks/batch/', {'title': '任务'}, format='json').status_code, 400)
+
+
+class ProjectDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                phone='13800000000')
+        today = timezone.localdate()
+        cls.project = Project.objects.create(name='项目', initiation_date=today - datetime.timedelta(days=80),
+                                             PM=cls.user)
+        cls.empty = Project.objects.create(name='空项目', PM=cls.user)
+        now = timezone.now()
+        past, future = now - datetime.timedelta(days=1), now + datetime.timedelta(days=1)
+        STATUS = Task.STATUS_CHOICES
+        for status, deadline in ((STATUS.TODO, past), (STATUS.IN_PROGRESS, future), (STATUS.DELAYED, None),
+                                 (STATUS.PAUSED, past), (STATUS.COMPLETED, past), (STATUS.COMPLETED, None),
+                                 (STATUS.CANCELLED, past)):
+            Task.objects.create(title=status, project=cls.project, status=status, deadline=deadline)
+
+    def setUp(self):
+        cache.clear()
+        revocation_list.sync(force=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def counts(self, data):
+        return (data['open_tasks'], data['overdue_tasks'], data['completed_tasks'], data['days_until_completion'])
+
+    def test_counts(self):
+        # 已完成、已取消的任务不算未完成，也不算逾期；预计验收日期默认为立项后 90 天
+        expected = {self.project.pk: (4, 2, 2, 10), self.empty.pk: (0, 0, 0, None)}
+        for url in ('/api/projects/', '/api/projects/feed/'):
+            with self.subTest(url=url):
+                results = self.client.get(url).data['results']
+                self.assertEqual({project['id']: self.counts(project) for project in results}, expected)
+        response = self.client.get(f'/api/projects/{self.project.pk}/')
+        self.assertEqual(self.counts(response.data), expected[self.project.pk])
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                phone='13800000000', expertise='审计')
+
+    def setUp(self):
+        cache.clear()
+        revocation_list.sync(force=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.url = f'/api/employees/{self.user.pk}/'
+
+    def test_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id', 'name'})
+        select, = [query['sql'] for query in queries if query['sql'].startswith('SELECT "Themis_employee"."id"')
+                   and 'LIMIT' in query['sql']]
+        columns = select.split(' FROM ')[0]
+        self.assertIn('"Themis_employee"."name"', columns)
+        self.assertNotIn('"Themis_employee"."phone"', columns)
+
+    def test_write_ignores_fields(self):
+        response = self.client.patch(f'{self.url}?fields=id', {'expertise': '税务'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expertise'], '税务')
+        self.assertIn('name', response.data)
+        self.assertEqual(Employee.objects.get(pk=self.user.pk).expertise, '税务')
+
+
+class KeysetPaginationTests(TestCase):
+    employees = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        # 同步导入会留下大量空工号，排序键大量重复
+        cls.ids = [Employee.objects.create(username=f'user{n}', name=f'员工{n}', phone='13800000000',
+                                           employee_number='' if n % 4 else f'E{n:04d}').pk
+                   for n in range(cls.employees)]
+
+    def setUp(self):
+        revocation_list.sync(force=True)
+        self.client = APIClient()
+        user = Employee.objects.get(pk=self.ids[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def walk(self, url, link='next'):
+        """Follows ``link`` from ``url`` to the end and returns the ids in list order and the last response."""
+        ids = []
+        for _ in range(self.employees + 1):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            page = [employee['id'] for employee in response.data['results']]
+            ids = ids + page if link == 'next' else page + ids
+            url = response.data[link]
+            if url is None:
+                return ids, response
+        self.fail(f'{link} links do not end')
+
+    def test_ties(self):
+        expected = list(Employee.objects.order_by('employee_number', 'id').values_list('id', flat=True))
+        # 父类靠 offset 跳过键值相同的行，offset 被截断后会重复翻页
+        with mock.patch('Themis.pagination.KeysetPagination.offset_cutoff', 1):
+            ids, _ = self.walk('/api/employees/?pagination=keyset&ordering=employee_number&page_size=2')
+            self.assertEqual(ids, expected)
+            ids, last = self.walk('/api/employees/?pagination=keyset&ordering=-employee_number&page_size=5')
+            self.assertEqual(ids, expected[::-1])
+            ids, _ = self.walk(last.data['previous'], link='previous')
+            self.assertEqual(ids, expected[::-1][:10])
+
+    def test_invalid_cursor(self):
+        for cursor in ('x', 'cD1hYmM=', 'cD0lNUIlMjJ4JTIyJTVE'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/employees/', {'cursor': cursor, 'ordering': 'date_joined'})
+                self.assertEqual(response.status_code, 404)
+
+
+class DepartmentTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Department.objects.create(department='总部')
+        cls.a = Department.objects.create(department='研发', parent_department=cls.root)
+        cls.b = Department.objects.create(department='平台', parent_department=cls.a)
+        cls.c = Department.objects.create(department='数据', parent_department=cls.b)
+        cls.other = Department.objects.create(department='分公司')
+        cls.user = Employee.objects.create(username='admin', name='管理员', phone='13800000000',
+                                           position=Position.objects.create(department=cls.b, title='工程师'))
+        Employee.objects.create(username='user1', name='员工1', phone='13800000000',
+                                position=Position.objects.create(department=cls.c, title='分析师'))
+
+    def paths(self):
+        return {department.department: (department.path, department.depth) for department in Department.objects.all()}
+
+    def test_paths(self):
+        root, a, b, c = (self.root.pk, self.a.pk, self.b.pk, self.c.pk)
+        self.assertEqual(self.paths()['数据'], (f'/{root}/{a}/{b}/{c}/', 3))
+        self.assertEqual(set(self.a.get_descendants().values_list('pk', flat=True)), {a, b, c})
+        self.assertEqual(set(self.a.get_descendants(include_self=False).values_list('pk', flat=True)), {b, c})
+
+    def test_move(self):
+        self.a.parent_department = self.other
+        self.a.save()
+        other, a, b, c = (self.other.pk, self.a.pk, self.b.pk, self.c.pk)
+        paths = self.paths()
+        self.assertEqual(paths['研发'], (f'/{other}/{a}/', 1))
+        self.assertEqual(paths['数据'], (f'/{other}/{a}/{b}/{c}/', 3))
+        self.assertEqual(paths['总部'], (f'/{self.root.pk}/', 0))
+        # 移到根部
+        self.b.parent_department = None
+        self.b.save()
+        self.assertEqual(self.paths()['数据'], (f'/{b}/{c}/', 1))
+
+    def test_move_under_descendant(self):
+        for parent in (self.a, self.c):
+            with self.subTest(parent=parent.department):
+                self.a.parent_department = parent
+                with self.assertRaises(ValidationError) as context:
+                    self.a.full_clean()
+                self.assertIn('parent_department', context.exception.message_dict)
+                with self.assertRaises(ValidationError):
+                    self.a.save()
+        self.assertEqual(self.paths()['研发'], (f'/{self.root.pk}/{self.a.pk}/', 1))
+
+    def test_parent_without_path(self):
+        Department.objects.filter(pk=self.other.pk).update(path='')
+        department = Department(department='新部门', parent_department=self.other)
+        with self.assertRaises(ValidationError) as context:
+            department.full_clean()
+        self.assertIn('parent_department', context.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            department.save()
+        self.assertFalse(Department.objects.filter(department='新部门').exists())
+
+    def test_delete_reroots(self):
+        self.a.delete()
+        b, c = self.b.pk, self.c.pk
+        paths = self.paths()
+        self.assertEqual(paths['平台'], (f'/{b}/', 0))
+        self.assertEqual(paths['数据'], (f'/{b}/{c}/', 1))
+        self.assertEqual(paths['总部'], (f'/{self.root.pk}/', 0))
+
+    def test_subtree(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        revocation_list.sync(force=True)
+        response = client.get(f'/api/departments/{self.a.pk}/subtree/', {'employees': 1})
+        self.assertEqual(response.status_code, 200)
+        a = response.data['department']
+        self.assertEqual((a['headcount'], a['total_headcount']), (0, 2))
+        b, = a['children']
+        self.assertEqual((b['id'], b['headcount'], b['total_headcount']), (self.b.pk, 1, 2))
+        self.assertEqual([child['id'] for child in b['children']], [self.c.pk])
+        self.assertEqual(len(response.data['employees']), 2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RevocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                phone='13800000000')
+
+    def setUp(self):
+        revocation_list.sync(force=True)
+        self.client = APIClient()
+        response = self.client.post('/api/token/', {'username': 'admin', 'password': 'secret'})
+        self.access, self.refresh = response.data['access'], response.data['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def assertRevoked(self):
+        self.assertEqual(self.client.get('/api/employees/').status_code, 401)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': self.refresh}).status_code, 401)
+
+    def test_logout(self):
+        self.assertEqual(self.client.get('/api/employees/').status_code, 200)
+        self.assertEqual(self.client.post('/api/token/revoke/', {'refresh': self.refresh}).status_code, 204)
+        self.assertRevoked()
+        # 其他进程从数据库同步注销列表
+        revocation_list.jtis = frozenset()
+        revocation_list.sync(force=True)
+        self.assertRevoked()
+
+    def test_deactivated(self):
+        Employee.objects.filter(pk=self.user.pk).update(is_active=False)
+        revocation_list.sync(force=True)
+        self.assertRevoked()
+
+    def test_employee_cache(self):
+        others = [Employee.objects.create(username=f'user{n}', name=f'员工{n}', phone='13800000000')
+                  for n in range(2)]
+        authentication._employees.clear()
+        with mock.patch('Themis.authentication.USER_CACHE_SIZE', 2):
+            with self.assertNumQueries(3):
+                for employee in (self.user, *others):
+                    cached_employee(employee.pk)
+            self.assertEqual(list(authentication._employees), [others[0].pk, others[1].pk])
+            with self.assertNumQueries(0):
+                cached_employee(others[0].pk)
+            with self.assertNumQueries(1):
+                cached_employee(self.user.pk)
+            # 最久未使用的 others[1] 被淘汰
+            self.assertEqual(list(authentication._employees), [others[0].pk, self.user.pk])
+            # 过期的条目重新查询
+            authentication._employees[others[0].pk] = (0, authentication._employees[others[0].pk][1])
+            with self.assertNumQueries(1):
+                cached_employee(others[0].pk)
+        authentication._employees.clear()
+
+
+class EmployeeSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.xiaoming = Employee.objects.create(username='wxm', name='王小明', phone='13800000000',
+                                               expertise='数据分析', employee_number='G0001')
+        cls.wangda = Employee.objects.create(username='wd', name='王大', phone='13800000000')
+        cls.liming = Employee.objects.create(username='lm', name='李明', phone='13800000000',
+                                             graduated_from='复旦大学')
+
+    def setUp(self):
+        revocation_list.sync(force=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.xiaoming).access_token}')
+
+    def search(self, query, **params):
+        response = self.client.get('/api/employees/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [employee['id'] for employee in response.data]
+
+    def test_matches(self):
+        self.assertEqual(self.search('小明'), [self.xiaoming.pk])
+        self.assertEqual(self.search('wangxiao'), [self.xiaoming.pk])
+        self.assertEqual(self.search('WXM'), [self.xiaoming.pk])
+        self.assertEqual(self.search('sjfx'), [self.xiaoming.pk])
+        self.assertEqual(self.search('g000'), [self.xiaoming.pk])
+        self.assertEqual(self.search('复旦'), [self.liming.pk])
+        self.assertEqual(self.search('zhang'), [])
+
+    def test_order(self):
+        # 按命中的搜索词排序，词相同时按员工 id
+        self.assertEqual(self.search('王'), [self.wangda.pk, self.xiaoming.pk])
+        self.assertEqual(self.search('ming'), [self.xiaoming.pk, self.liming.pk])
+        self.assertEqual(self.search('王', limit=1), [self.wangda.pk])
+
+    def test_invalid_limit(self):
+        self.assertEqual(self.search('王', limit=-1), [self.wangda.pk])
+        self.assertEqual(len(self.search('王', limit='x')), 2)
+
+    def test_rename_drops_stale_terms(self):
+        self.xiaoming.name = '赵六'
+        self.xiaoming.save()
+        self.assertEqual(self.search('wxm'), [])
+        self.assertEqual(self.search('小明'), [])
+        self.assertEqual(self.search('zl'), [self.xiaoming.pk])
+        # 未参与索引的字段变化不重建索引
+        with self.assertNumQueries(1):
+            self.xiaoming.save(update_fields=['phone'])
+
+
+class TaskFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Employee.objects.create(username='admin', name='管理员', phone='13800000000')
+        cls.other = Employee.objects.create(username='other', name='员工', phone='13800000000')
+        cls.projects = [Project.objects.create(name=f'项目{n}', initiation_date=datetime.date(2024, 5, 1))
+                        for n in range(2)]
+        deadline = datetime.datetime(2024, 6, 1, tzinfo=datetime.timezone.utc)
+        cls.tasks = [
+            Task.objects.create(title='a', project=cls.projects[0], status='todo', priority='0', DRI=cls.user,
+                                deadline=deadline),
+            Task.objects.create(title='b', project=cls.projects[0], status='completed', priority='2',
+                                DRI=cls.other, deadline=deadline + datetime.timedelta(days=10)),
+            Task.objects.create(title='c', project=cls.projects[0], status='todo', priority='2', DRI=cls.user),
+            Task.objects.create(title='d', project=cls.projects[1], status='in-progress', priority='0',
+                                DRI=cls.user, deadline=deadline + datetime.timedelta(days=20)),
+        ]
+
+    def setUp(self):
+        revocation_list.sync(force=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def titles(self, **params):
+        response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [task['title'] for task in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.titles(project=self.projects[0].pk), ['a', 'b', 'c'])
+        self.assertEqual(self.titles(project=f'{self.projects[0].pk},{self.projects[1].pk}', status='todo,in-progress'),
+                         ['a', 'c', 'd'])
+        self.assertEqual(self.titles(priority='2', DRI=self.user.pk), ['c'])
+        self.assertEqual(self.titles(deadline_after='2024-06-05T00:00:00Z'), ['b', 'd'])
+        self.assertEqual(self.titles(deadline_before='2024-06-05T00:00:00Z', deadline_after='2024-01-01T00:00:00Z'),
+                         ['a'])
+
+    def test_invalid_filters(self):
+        for params in ({'project': 'x'}, {'deadline_before': 'tomorrow'}, {'deadline_after': '2024-13-01T00:00'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/tasks/', params).status_code, 400)
+                self.assertEqual(self.client.get('/api/tasks/export.csv/', params).status_code, 400)
+
+    def test_rollup(self):
+        first, second = self.projects
+        response = self.client.get('/api/tasks/rollup/', {'project': f'{first.pk},{second.pk},0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[first.pk]['total'], 3)
+        self.assertEqual(response.data[first.pk]['status']['todo'], 2)
+        self.assertEqual(response.data[first.pk]['status']['completed'], 1)
+        self.assertEqual(response.data[first.pk]['status']['delayed'], 0)
+        self.assertEqual(response.data[first.pk]['priority'], {'0': 1, '1': 0, '2': 2, '3': 0})
+        self.assertEqual(response.data[second.pk]['status']['in-progress'], 1)
+        # 没有任务的项目也返回全零统计
+        self.assertEqual(response.data[0]['total'], 0)
+        self.assertEqual(self.client.get('/api/tasks/rollup/').status_code, 400)
+
+
+class TaskTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Employee.objects.create(username='admin', name='管理员', phone='13800000000')
+        project = Project.objects.create(name='项目', initiation_date=datetime.date(2024, 5, 1))
+        cls.deadline = datetime.datetime(2024, 6, 1, tzinfo=datetime.timezone.utc)
+
+        def task(title, parent=None, days=None, status='todo'):
+            deadline = cls.deadline + datetime.timedelta(days=days) if days is not None else None
+            return Task.objects.create(title=title, project=project, parent_task=parent, deadline=deadline,
+                                       status=status)
+        cls.root = task('根')
+        cls.a = task('a', cls.root, days=1, status='completed')
+        cls.a1 = task('a1', cls.a, days=5)
+        task('a2', cls.a, status='completed')
+        cls.b = task('b', cls.root, days=3)
+        task('其他')
+
+    def setUp(self):
+        revocation_list.sync(force=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def tree(self, pk):
+        response = self.client.get(f'/api/tasks/{pk}/tree/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_rollup(self):
+        root = self.tree(self.root.pk)
+        self.assertEqual((root['total'], root['completed']), (4, 2))
+        self.assertEqual(root['latest_deadline'], '2024-06-06T00:00:00Z')
+        a, b = root['children']
+        self.assertEqual([a['title'], b['title']], ['a', 'b'])
+        self.assertEqual((a['total'], a['completed'], a['latest_deadline']), (2, 1, '2024-06-06T00:00:00Z'))
+        self.assertEqual([child['title'] for child in a['children']], ['a1', 'a2'])
+        self.assertEqual((b['total'], b['completed'], b['latest_deadline'], b['children']), (0, 0, None, []))
+        self.assertEqual(self.tree(self.a.pk)['total'], 2)
+
+    def test_cycle(self):
+        # a -> a1 -> a 成环；递归遇到根任务即停止，每个任务只取一次
+        Task.objects.filter(pk=self.a.pk).update(parent_task=self.a1)
+        self.assertEqual(len(Task.subtree(self.a.pk)), 3)
+        self.assertEqual(len(Task.subtree(self.root.pk)), 2)
+        tree = self.tree(self.a.pk)
+        self.assertEqual((tree['total'], tree['completed']), (2, 1))
+        self.assertEqual(tree['children'][0]['children'], [])
+
+    def test_not_found(self):
+        for pk in (0, 'abc'):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.client.get(f'/api/tasks/{pk}/tree/').status_code, 404)
+
+
+class ProjectMembershipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employees = [Employee.objects.create(username=f'user{n}', name=f'员工{n}', phone='13800000000')
+                         for n in range(4)]
+        cls.projects = [Project.objects.create(name=f'项目{n}', initiation_date=datetime.date(2024, 5, 1))
+                        for n in range(2)]
+
+    def roles(self, role):
+        return set(ProjectMembership.objects.filter(role=role).values_list('employee_id', 'project_id'))
+
+    def test_managers(self):
+        first, second, third, _ = (employee.pk for employee in self.employees)
+        project = self.projects[0]
+        project.PM, project.BM = self.employees[0], self.employees[1]
+        project.save()
+        self.assertEqual(self.roles('PM'), {(first, project.pk)})
+        self.assertEqual(self.roles('BM'), {(second, project.pk)})
+        project.PM = self.employees[2]
+        project.BM = None
+        project.save(update_fields=['PM', 'BM'])
+        self.assertEqual(self.roles('PM'), {(third, project.pk)})
+        self.assertEqual(self.roles('BM'), set())
+
+    def test_watchers(self):
+        first, second = self.projects
+        employee, other = self.employees[:2]
+        first.watched_by.add(employee, other)
+        employee.watched_projects.add(second)
+        self.assertEqual(self.roles('watcher'), {(employee.pk, first.pk), (other.pk, first.pk),
+                                                 (employee.pk, second.pk)})
+        first.watched_by.remove(other)
+        self.assertEqual(self.roles('watcher'), {(employee.pk, first.pk), (employee.pk, second.pk)})
+        employee.watched_projects.clear()
+        self.assertEqual(self.roles('watcher'), set())
+        first.watched_by.add(other)
+        first.watched_by.clear()
+        self.assertEqual(self.roles('watcher'), set())
+
+    def test_task_dri(self):
+        first, second = self.projects
+        employee, other = self.employees[:2]
+        task = Task.objects.create(title='任务', project=first, DRI=employee)
+        Task.objects.create(title='其他任务', project=first, DRI=other)
+        self.assertEqual(self.roles('DRI'), {(employee.pk, first.pk), (other.pk, first.pk)})
+        # 换负责人
+        task.DRI = other
+        task.save(update_fields=['DRI'])
+        self.assertEqual(self.roles('DRI'), {(other.pk, first.pk)})
+        # 移到其他项目
+        task.project = second
+        task.save()
+        self.assertEqual(self.roles('DRI'), {(other.pk, first.pk), (other.pk, second.pk)})
+        task.delete()
+        self.assertEqual(self.roles('DRI'), {(other.pk, first.pk)})
+
+    def test_task_save_queries(self):
+        task = Task.objects.create(title='任务', project=self.projects[0], DRI=self.employees[0])
+        task.status = 'completed'
+        # 只更新任务和刷新项目的 updated_at，不读取原项目也不同步负责人
+        with self.assertNumQueries(2):
+            task.save(update_fields=['status'])
+
+
+class ImportEmployeesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference.clear_reference_tables()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = f'{directory}/employees.xlsx'
+
+    def import_rows(self, rows, *args):
+        defaults = {'OA': '华东', 'department': '研发', 'title': '工程师', 'gender': '男', 'date_joined': '2024-05-01',
+                    'contract_start_date': None, 'contract_end_date': None, 'contract_renewed_times': 0,
+                    'phone': '13800000000', 'status': '在职', 'expertise': None, 'degree': None, 'graduated_from': None,
+                    'salary_place': None, 'work_place': None, 'contract_place': None, 'insurance_place': None,
+                    'id_address': None, 'bank_number': None, 'id_number': None}
+        pd.DataFrame([{**defaults, **row} for row in rows]).to_excel(self.path, index=False)
+        out, err = StringIO(), StringIO()
+        call_command('import_employees', self.path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_bulk(self):
+        _, err = self.import_rows([
+            {'name': '王伟', 'employee_number': 'E0001', 'id_number': '110000000000000001'},
+            {'name': '王伟', 'employee_number': 'E0002'},
+            {'name': '李明', 'employee_number': 'E0003', 'phone': None},
+        ], '--bulk', '--batch-size', '1')
+        self.assertIn('李明: no phone number', err)
+        employees = Employee.objects.order_by('employee_number')
+        self.assertEqual([(e.username, e.email) for e in employees],
+                         [('wangwei', 'wangwei@dihuge.com'), ('wangwei2', 'wangwei2@dihuge.com')])
+        self.assertEqual({e.position.title for e in employees}, {'工程师'})
+        self.assertEqual(employees[0].id_number, '110000000000000001')
+
+    def test_bulk_reports_progress(self):
+        Employee.objects.create(username='existing', name='已有', phone='13800000000', id_number='X1')
+        with self.assertRaisesMessage(CommandError, 'the first 1 employees were imported'):
+            self.import_rows([{'name': '张三', 'employee_number': 'E0001'},
+                              {'name': '李四', 'employee_number': 'E0002', 'id_number': 'X1'}],
+                             '--bulk', '--batch-size', '1')
+        self.assertTrue(Employee.objects.filter(employee_number='E0001').exists())
+
+    def test_sync(self):
+        self.import_rows([{'name': '张三', 'employee_number': 'E0001', 'id_number': 'X1'},
+                          {'name': '李四', 'employee_number': 'E0002'}], '--bulk')
+        out, err = self.import_rows([
+            {'name': '张三丰', 'employee_number': 'E0001', 'id_number': 'X1'},
+            {'name': '李四', 'employee_number': 'E0002'},
+            {'name': '王五', 'employee_number': 'E0003'},
+            # 重复的新员工、通过身份证号匹配到同一员工的行、缺少电话的行都跳过
+            {'name': '王五', 'employee_number': 'E0003'},
+            {'name': '张三', 'employee_number': 'E0009', 'id_number': 'X1'},
+            {'name': '赵六', 'employee_number': 'E0004', 'phone': None},
+        ], '--sync')
+        self.assertIn('inserted=1 updated=1 unchanged=1 skipped=3', out)
+        self.assertEqual(err.count('Skipped'), 3)
+        self.assertEqual(dict(Employee.objects.values_list('employee_number', 'name')),
+                         {'E0001': '张三丰', 'E0002': '李四', 'E0003': '王五'})
+        # 用户名不随同步改变
+        self.assertEqual(Employee.objects.get(employee_number='E0001').username, 'zhangsan')
+
+    def test_sync_is_atomic(self):
+        self.import_rows([{'name': '张三', 'employee_number': 'E0001'}], '--bulk')
+        with mock.patch.object(type(Employee.objects), 'bulk_create', side_effect=IntegrityError('duplicate')), \
+                self.assertRaises(IntegrityError):
+            self.import_rows([{'name': '张三丰', 'employee_number': 'E0001'},
+                              {'name': '李四', 'employee_number': 'E0002'}], '--sync')
+        self.assertEqual(list(Employee.objects.values_list('name', flat=True)), ['张三'])
+
+
+class InitialPasswordTests(TestCase):
+    def test_spawn(self):
+        stale = timezone.now() - datetime.timedelta(days=1)
+        for index in range(3):
+            Employee.objects.create(username=f'user{index}', name=f'员工{index}', phone='13800000000')
+        Employee.objects.create_user(username='admin', password='secret', name='管理员', phone='13800000000')
+        Employee.objects.update(updated_at=stale)
+        # spawn 启动的子进程从头导入命令模块（macOS、Windows 的默认方式）
+        spawn_pool = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        out = StringIO()
+        with mock.patch('Themis.management.commands.initial_password.ProcessPoolExecutor', spawn_pool):
+            call_command('initial_password', '--workers', '2', '--batch-size', '2', stdout=out)
+        self.assertIn('Successfully set password for 3 users', out.getvalue())
+        for employee in Employee.objects.filter(username__startswith='user'):
+            self.assertTrue(employee.check_password(INITIAL_PASSWORD))
+            self.assertGreater(employee.updated_at, stale)
+        admin = Employee.objects.get(username='admin')
+        self.assertTrue(admin.check_password('secret'))
+        self.assertEqual(admin.updated_at, stale)
+
+
+class OverdueSweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name='项目', initiation_date=datetime.date(2024, 5, 1))
+
+    def task(self, title, days, status=Task.STATUS_CHOICES.TODO):
+        return Task.objects.create(title=title, project=self.project, status=status,
+                                   deadline=timezone.now() + datetime.timedelta(days=days))
+
+    def statuses(self):
+        return dict(Task.objects.values_list('title', 'status'))
+
+    def test_marks_overdue(self):
+        self.task('逾期', -1)
+        self.task('未到期', 1)
+        for status in ('completed', 'cancelled', 'delayed'):
+            self.task(status, -1, status=status)
+        now = timezone.now()
+        self.assertEqual(sweep_overdue_tasks(now), 1)
+        self.assertEqual(self.statuses(), {'逾期': 'delayed', '未到期': 'todo', 'completed': 'completed',
+                                           'cancelled': 'cancelled', 'delayed': 'delayed'})
+        self.assertEqual(JobWatermark.objects.get(name=OVERDUE_WATERMARK).watermark, now)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.updated_at, now)
+
+    def test_watermark(self):
+        sweep_overdue_tasks()
+        task = self.task('未到期', 1)
+        # 截止时间在两次扫描之间经过
+        later = timezone.now() + datetime.timedelta(days=2)
+        self.assertEqual(sweep_overdue_tasks(later), 1)
+        self.assertEqual(JobWatermark.objects.get(name=OVERDUE_WATERMARK).watermark, later)
+        # 水位不会回退
+        sweep_overdue_tasks(later - datetime.timedelta(days=1))
+        self.assertEqual(JobWatermark.objects.get(name=OVERDUE_WATERMARK).watermark, later)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'delayed')
+
+    def test_deadline_behind_watermark(self):
+        sweep_overdue_tasks()
+        # 水位之后新建、重新打开或改到过去截止时间的任务
+        created = self.task('新建', -3)
+        reopened = self.task('重新打开', -2, status='completed')
+        self.assertEqual(sweep_overdue_tasks(), 1)
+        reopened.status = 'in-progress'
+        reopened.save()
+        self.assertEqual(sweep_overdue_tasks(), 1)
+        self.assertEqual(self.statuses(), {created.title: 'delayed', reopened.title: 'delayed'})
+        self.assertEqual(sweep_overdue_tasks(), 0)
+
+    def test_full(self):
+        sweep_overdue_tasks()
+        task = self.task('旧任务', -3)
+        # 绕过 auto_now，模拟水位之前写入的任务
+        Task.objects.filter(pk=task.pk).update(updated_at=timezone.now() - datetime.timedelta(days=3))
+        self.assertEqual(sweep_overdue_tasks(), 0)
+        self.assertEqual(sweep_overdue_tasks(full=True), 1)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_generate_and_benchmark(self):
+        call_command('generate_org_data', employees=40, projects=8, tasks=100, departments=20, depth=4,
+                     batch_size=16, seed=1, stdout=StringIO())
+        self.assertEqual(Employee.objects.count(), 40)
+        self.assertEqual(Task.objects.count(), 100)
+        self.assertEqual(Department.objects.count(), 20)
+        for department in Department.objects.select_related('parent_department'):
+            parent_path = department.parent_department.path if department.parent_department else '/'
+            self.assertEqual(department.path, f'{parent_path}{department.pk}/')
+        self.assertEqual(len(set(Project.objects.values_list('code', flat=True))), 8)
+
+        output = StringIO()
+        call_command('benchmark_api', requests=40, warmup=0, seed=1, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['requests'], 40)
+        self.assertEqual(report['errors'], 0)
+        self.assertLessEqual(report['latency_ms']['p50'], report['latency_ms']['p99'])
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.reset()
+        revocation_list.sync(force=True)
+        self.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                 phone='13800000000')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get('/api/employees/?pagination=keyset')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('olympus_db_queries_bucket{view="employee-list",le="2"} 1', body)
+        self.assertIn('olympus_request_duration_seconds_count{view="employee-list"} 1', body)
+
+    def test_slow_request_logs_sql(self):
+        with mock.patch('Themis.middleware.SLOW_REQUEST_THRESHOLD_MS', 0), \
+                self.assertLogs('Themis.middleware', 'WARNING') as logs:
+            self.client.get('/api/employees/')
+            self.client.get(f'/api/employees/{self.user.pk}/')
+        self.assertIn('employee-list', logs.output[0])
+        self.assertIn('FROM "Themis_employee"', logs.output[0])
+        # 只记录 SQL 文本，不记录参数
+        self.assertIn('"Themis_employee"."id" = %s', logs.output[1])
+        self.assertNotIn(f'({self.user.pk},)', logs.output[1])
+
+    def test_metrics_restricted(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.8').status_code, 403)
+
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+            self.skipTest('SQLite tuning disabled')
+        with connection.cursor() as cursor:
+            for name, expected in (('journal_mode', 'wal'), ('synchronous', 1), ('busy_timeout', 5000)):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], expected)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_list.sync(force=True)
+        self.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                 phone='13800000000', expertise='审计')
+        self.url = f'/api/employees/{self.user.pk}/basicInfo/'
+        self.headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.client = AsyncClient()
+
+    async def test_basic_info(self):
+        response = await self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], '管理员')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        response = await self.client.get(self.url, headers=self.headers)
+        self.assertIn('desc="0 queries"', response['Server-Timing'])
+        response = await self.client.get(f'/api/employees/{self.user.pk + 1}/basicInfo/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requires_valid_token(self):
+        response = await self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+        response = await self.client.get(self.url, headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+
+    async def test_session(self):
+        # 与 DRF 视图一样接受会话认证
+        await self.client.aforce_login(self.user)
+        response = await self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], '管理员')
+        self.assertEqual((await self.client.get('/api/employees/')).status_code, 200)
+
+    async def test_session_upload_requires_csrf(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        await client.aforce_login(self.user)
+        response = await client.post(f'/api/employees/{self.user.pk}/avatar/')
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('CSRF', response.json()['detail'])
+
+
+class AsgiBenchmarkTests(TransactionTestCase):
+    def test_sync_and_async_forms(self):
+        cache.clear()
+        revocation_list.sync(force=True)
+        Employee.objects.create_user(username='admin', password='secret', name='管理员', phone='13800000000')
+        output = StringIO()
+        call_command('benchmark_asgi', requests=4, concurrency=2, host='testserver', stdout=output)
+        path, = json.loads(output.getvalue())['paths'].values()
+        # 同一个 URL 分别由同步和异步视图处理
+        self.assertEqual(set(path), {'sync', 'async'})
+        for result in path.values():
+            self.assertEqual((result['requests'], result['errors']), (4, 0))
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation_list.sync(force=True)
+        images._existing.clear()
+        images._missing.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.user = Employee.objects.create_user(username='admin', password='secret', name='管理员',
+                                                 phone='13800000000')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def image(self, size=(300, 200)):
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def thumbnails(self):
+        return EmployeeBasicInfoSerializer(Employee.objects.get(pk=self.user.pk)).data['avatar_thumbnails']
+
+    def test_falls_back_until_generated(self):
+        # 默认头像从未生成缩略图
+        avatar = Employee.objects.get(pk=self.user.pk).avatar
+        self.assertEqual(self.thumbnails(), {str(size): avatar.url for size in images.THUMBNAIL_SIZES})
+        default_storage.save(avatar.name, ContentFile(self.image()))
+        images.generate_thumbnails(avatar.name)
+        thumbnails = self.thumbnails()
+        for size in images.THUMBNAIL_SIZES:
+            name = images.thumbnail_name(avatar.name, size)
+            self.assertEqual(thumbnails[str(size)], default_storage.url(name))
+            with default_storage.open(name) as file, Image.open(file) as thumbnail:
+                self.assertEqual(thumbnail.format, 'WEBP')
+                self.assertEqual(max(thumbnail.size), size)
+
+    def test_misses_are_cached(self):
+        Employee.objects.create(username='user1', name='员工1', phone='13800000000')
+        employees = Employee.objects.all()
+        with mock.patch.object(default_storage, 'exists', wraps=default_storage.exists) as exists:
+            EmployeeBasicInfoSerializer(employees, many=True).data
+            # 两名员工都是默认头像，每个尺寸只查一次存储
+            self.assertEqual(exists.call_count, len(images.THUMBNAIL_SIZES))
+            EmployeeBasicInfoSerializer(employees, many=True).data
+            self.assertEqual(exists.call_count, len(images.THUMBNAIL_SIZES))
+            # 缺失记录过期后重新查询
+            images._missing.update(dict.fromkeys(images._missing, 0))
+            EmployeeBasicInfoSerializer(employees, many=True).data
+            self.assertEqual(exists.call_count, 2 * len(images.THUMBNAIL_SIZES))
+
+    def test_store_upload_race(self):
+        content = self.image()
+        name = images.store_upload(SimpleUploadedFile('a.png', content), 'avatars/')
+        # 并发的相同上传在 exists() 之后、save() 之前已写入同名文件
+        exists, checks = default_storage.exists, iter([False])
+
+        def racing_exists(path):
+            return next(checks, exists(path))
+
+        with mock.patch.object(default_storage, 'exists', side_effect=racing_exists) as patched:
+            self.assertEqual(images.store_upload(SimpleUploadedFile('b.PNG', content), 'avatars/'), name)
+        self.assertGreater(patched.call_count, 1)
+        self.assertEqual(default_storage.listdir('avatars/')[1], [name.rsplit('/', 1)[1]])
+
+    def test_upload_refreshes_profile_card(self):
+        key = profile_card_key(self.user.pk)
+
+        def generate_now(name):
+            # 生成期间有请求缓存了指向原图的名片
+            cache.set(key, {'stale': True})
+            images.generate_thumbnails(name)
+            future = Future()
+            future.set_result(None)
+            return future
+
+        upload = SimpleUploadedFile('image.png', self.image(), content_type='image/png')
+        with mock.patch('Themis.views.Employee.views.schedule_thumbnails', side_effect=generate_now):
+            response = self.client.post(f'/api/employees/{self.user.pk}/avatar/', {'avatar': upload},
+                                        format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get(key))
+        card = self.client.get(f'/api/employees/{self.user.pk}/basicInfo/').json()
+        name = Employee.objects.get(pk=self.user.pk).avatar.name
+        self.assertTrue(card['avatar_thumbnails']['64'].endswith(images.thumbnail_name(name, 64)))
+
+    def test_schedule_skips_pending(self):
+        started, release = threading.Event(), threading.Event()
+
+        def generate(name):
+            started.set()
+            release.wait(5)
+
+        with mock.patch('Themis.images.generate_thumbnails', side_effect=generate):
+            future = images.schedule_thumbnails('avatars/pending.png')
+            started.wait(5)
+            self.assertIsNone(images.schedule_thumbnails('avatars/pending.png'))
+            release.set()
+            future.result(5)
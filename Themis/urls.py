@@ -1,22 +1,31 @@
 from django.conf.urls.static import static
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
 
 from Olympus import settings
 from django.contrib import admin
-from Themis.views.Employee.views import EmployeeViewSet, LoginView, UploadView, employee_basic_info
+from Themis.metrics import metrics
+from Themis.views.Department.views import DepartmentViewSet
+from Themis.views.Employee.views import EmployeeViewSet, LoginView, upload_image, employee_basic_info, RefreshView, \
+    LogoutView
+from Themis.views.Project.views import ProjectViewSet
+from Themis.views.Task.views import TaskViewSet
 
 router = DefaultRouter()
 router.register(r'employees', EmployeeViewSet)
+router.register(r'departments', DepartmentViewSet)
+router.register(r'projects', ProjectViewSet)
+router.register(r'tasks', TaskViewSet)
 
 urlpatterns = [
     path('api/', include(router.urls)),
     path('api/token/', LoginView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/employees/<int:nid>/avatar/', UploadView.as_view(), name='upload_avatar'),
-    path('api/projects/<int:nid>/snapshot/', UploadView.as_view(), name='upload_snapshot'),
-    path('api/employees/<int:employee_id>/basicInfo/', employee_basic_info, name='employee_basic_info')
+    path('api/token/refresh/', RefreshView.as_view(), name='token_refresh'),
+    path('api/token/revoke/', LogoutView.as_view(), name='token_revoke'),
+    path('api/employees/<int:nid>/avatar/', upload_image, name='upload_avatar'),
+    path('api/projects/<int:nid>/snapshot/', upload_image, name='upload_snapshot'),
+    path('api/employees/<int:employee_id>/basicInfo/', employee_basic_info, name='employee_basic_info'),
+    path('metrics', metrics, name='metrics'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,45 @@
+from django.db.models import Count
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from Themis.models import Department
+from Themis.models import Employee
+from Themis.serializers import DepartmentSerializer, EmployeeListSerializer
+
+
+class DepartmentViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Department.objects.order_by('path')
+    serializer_class = DepartmentSerializer
+
+    @action(detail=True)
+    def subtree(self, request, pk=None):
+        """
+        The department tree rooted at ``pk`` with own and total headcount per node, plus every employee in it when
+        ``?employees=1`` is given. The number of queries does not depend on the depth or size of the tree.
+        """
+        root = self.get_object()
+        departments = DepartmentSerializer(root.get_descendants().order_by('path'), many=True).data
+        in_subtree = Employee.objects.filter(position__department__path__startswith=root.path)
+        headcount = dict(in_subtree.order_by().values_list('position__department').annotate(Count('id')))
+
+        nodes = {}
+        for department in departments:
+            department['headcount'] = department['total_headcount'] = headcount.get(department['id'], 0)
+            department['children'] = []
+            nodes[department['id']] = department
+        # 按路径排序后逆序遍历，子部门总在父部门之前汇总
+        for department in reversed(departments):
+            parent = nodes.get(department['parent_department'])
+            if parent and department['id'] != root.pk:
+                parent['total_headcount'] += department['total_headcount']
+        for department in departments:
+            parent = nodes.get(department['parent_department'])
+            if parent and department['id'] != root.pk:
+                parent['children'].append(department)
+
+        data = {'department': nodes[root.pk]}
+        if request.query_params.get('employees'):
+            employees = in_subtree.select_related('position__department').order_by('id')
+            data['employees'] = EmployeeListSerializer(employees, many=True, context={'request': request}).data
+        return Response(data)
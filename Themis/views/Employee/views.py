@@ -1,55 +1,153 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from Themis.authentication import authentication_required, revocation_list
 
+from Themis.images import schedule_thumbnails, store_upload
 from Themis.models import Project
 from Themis.models import Employee
-from Themis.serializers import EmployeeSerializer, LoginSerializer, EmployeeBasicInfoSerializer, \
-    ProjectSerializer
+from Themis.profiles import aget_profile_card, get_profile_card, invalidate_profile_cards, profile_card_key
+from Themis.search import INDEXED_FIELDS, index_employees, search_employee_ids
+from Themis.signals import touch
+from Themis.serializers import EmployeeSerializer, LoginSerializer, EmployeeListSerializer, RefreshSerializer
+from Themis.pagination import OptionalKeysetPagination
+from Themis.views.mixins import BatchMixin, ConditionalGetMixin, ExportMixin, SerializerSizedQuerysetMixin
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
-    queryset = Employee.objects.all()
+class EmployeeViewSet(ConditionalGetMixin, ExportMixin, BatchMixin, SerializerSizedQuerysetMixin,
+                      viewsets.ModelViewSet):
+    sized_actions = ('list', 'retrieve', 'search')
+    queryset = Employee.objects.order_by('id')
     serializer_class = EmployeeSerializer
+    # 默认仍为页码分页，?pagination=keyset 时使用游标分页
+    pagination_class = OptionalKeysetPagination
+    cursor_orderings = ('id', 'employee_number', 'date_joined')
+    export_name = 'employees'
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'search'):
+            return EmployeeListSerializer
+        return EmployeeSerializer
+
+    def batch_written(self, created, updated):
+        changed = [instance for instance, fields, _ in updated]
+        invalidate_profile_cards([employee.pk for employee in changed])
+        index_employees(created + [instance for instance, fields, _ in updated if set(fields) & set(INDEXED_FIELDS)])
+        renamed = [instance.pk for instance, fields, _ in updated if 'name' in fields]
+        if renamed:
+            touch(Project.objects.filter(Q(PM__in=renamed) | Q(BM__in=renamed) | Q(watched_by__in=renamed)).distinct())
+
+    @action(detail=False)
+    def search(self, request):
+        """Typeahead over name (Chinese, pinyin or initials), expertise, school and employee number."""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            limit = 10
+        ids = search_employee_ids(request.query_params.get('q', ''), limit)
+        employees = {employee.pk: employee for employee in self.get_queryset().filter(pk__in=ids)}
+        serializer = self.get_serializer([employees[pk] for pk in ids if pk in employees], many=True)
+        return Response(serializer.data)
 
 
 class LoginView(TokenObtainPairView):
     serializer_class = LoginSerializer
 
 
+class RefreshView(TokenRefreshView):
+    serializer_class = RefreshSerializer
+
+
+class LogoutView(APIView):
+    """Revokes the access token of the request and, if given, the ``refresh`` token in the body."""
+
+    def post(self, request):
+        if request.auth is not None and api_settings.JTI_CLAIM in request.auth:
+            revocation_list.revoke(request.auth, request.user.pk)
+        if request.data.get('refresh'):
+            try:
+                revocation_list.revoke(RefreshToken(request.data['refresh']), request.user.pk)
+            except TokenError:
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@require_GET
+@authentication_required
+async def employee_basic_info(request, employee_id):
+    try:
+        card = await aget_profile_card(employee_id)
+    except Employee.DoesNotExist:
+        raise Http404
+    return profile_card_response(request, card)
+
+
 @api_view(['GET'])
-def employee_basic_info(request, employee_id):
-    employee = Employee.objects.get(pk=employee_id)
-    serializer = EmployeeBasicInfoSerializer(employee)
-    return Response(serializer.data)
-
-
-class UploadView(APIView):
-    def post(self, request, nid):
-        url_path = request.path
-        if 'employees' in url_path:
-            model = Employee
-            file_key = 'avatar'
-            model_field = 'avatar'
-            serializer = EmployeeSerializer
-        elif 'projects' in url_path:
-            model = Project
-            file_key = 'snapshot'
-            model_field = 'snapshot'
-            serializer = ProjectSerializer
-        else:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        try:
-            instance = model.objects.get(pk=nid)
-        except model.DoesNotExist:
-            return Response(status=status.HTTP_304_NOT_MODIFIED)
-
-        if file_key in request.FILES:
-            setattr(instance, model_field, request.FILES[file_key])
-            instance.save()
-            serialized_ins = serializer(instance)
-            return Response(serialized_ins.data[file_key], status=status.HTTP_200_OK)
-        else:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+def employee_basic_info_sync(request, employee_id):
+    """Synchronous DRF form of ``employee_basic_info``, which benchmark_asgi serves on the same URL to compare."""
+    try:
+        card = get_profile_card(employee_id)
+    except Employee.DoesNotExist:
+        raise Http404
+    return profile_card_response(request, card)
+
+
+def profile_card_response(request, card):
+    # 名片缓存随员工和岗位的修改失效，直接以内容哈希作为 ETag
+    etag = f'"{hashlib.md5(json.dumps(card, sort_keys=True).encode()).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag) or JsonResponse(card)
+    response['ETag'] = etag
+    return response
+
+
+@csrf_exempt
+@require_POST
+@authentication_required
+async def upload_image(request, nid):
+    url_path = request.path
+    if 'employees' in url_path:
+        model = Employee
+        file_key = 'avatar'
+        model_field = 'avatar'
+    elif 'projects' in url_path:
+        model = Project
+        file_key = 'snapshot'
+        model_field = 'snapshot'
+    else:
+        return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+    try:
+        instance = await model.objects.only('pk', model_field).aget(pk=nid)
+    except model.DoesNotExist:
+        return HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+
+    # 解析 multipart、计算哈希和写文件都在线程池中进行，不阻塞事件循环
+    files = await sync_to_async(lambda: request.FILES, thread_sensitive=False)()
+    if file_key in files:
+        # 按内容哈希命名，相同图片只存一份
+        name = await sync_to_async(store_upload, thread_sensitive=False)(
+            files[file_key], model._meta.get_field(model_field).upload_to)
+        setattr(instance, model_field, name)
+        await instance.asave(update_fields=[model_field, 'updated_at'])
+        future = schedule_thumbnails(name)
+        if future is not None and model is Employee:
+            # 生成前缓存的名片指向原图，生成后删除；回调在后台线程执行，不经过事务以免占用数据库连接
+            future.add_done_callback(lambda _: cache.delete(profile_card_key(instance.pk)))
+        return JsonResponse(getattr(instance, model_field).url, safe=False)
+    else:
+        return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
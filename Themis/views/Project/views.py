@@ -0,0 +1,61 @@
+from django.db.models import Count, DateField, DurationField, ExpressionWrapper, F, Prefetch, Q, Value
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.decorators import action
+
+from Themis.models import Employee, Project, ProjectMembership, Task
+from Themis.pagination import KeysetPagination
+from Themis.serializers import ProjectDashboardSerializer, ProjectFeedSerializer, ProjectSerializer
+from Themis.views.mixins import ConditionalGetMixin, ExportMixin, SerializerSizedQuerysetMixin
+
+CLOSED_STATUSES = (Task.STATUS_CHOICES.COMPLETED, Task.STATUS_CHOICES.CANCELLED)
+
+
+class ProjectViewSet(ConditionalGetMixin, ExportMixin, SerializerSizedQuerysetMixin, viewsets.ModelViewSet):
+    """
+    Project dashboard. Reads join every foreign key, prefetch the watchers and annotate open/overdue/completed task
+    counts and the days left until ``completion_date_est`` in SQL, so a page costs a fixed number of queries.
+    """
+    queryset = Project.objects.order_by('id')
+    serializer_class = ProjectSerializer
+    pagination_class = KeysetPagination
+    prefetch_querysets = {'watched_by': Employee.objects.only('id', 'name')}
+    sized_actions = ('list', 'retrieve', 'feed')
+    # 逾期任务数和剩余天数随时间变化，验证器每分钟失效一次
+    conditional_time_bucket = 60
+    export_name = 'projects'
+
+    def get_serializer_class(self):
+        if self.action == 'feed':
+            return ProjectFeedSerializer
+        if self.action in self.sized_actions:
+            return ProjectDashboardSerializer
+        return ProjectSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.sized_actions:
+            return queryset
+        now = timezone.now()
+        open_tasks = ~Q(has_tasks__status__in=CLOSED_STATUSES)
+        return queryset.annotate(
+            open_tasks=Count('has_tasks', filter=open_tasks),
+            overdue_tasks=Count('has_tasks', filter=open_tasks & Q(has_tasks__deadline__lt=now)),
+            completed_tasks=Count('has_tasks', filter=Q(has_tasks__status=Task.STATUS_CHOICES.COMPLETED)),
+            days_until_completion=ExpressionWrapper(
+                F('completion_date_est') - Value(timezone.localdate(), output_field=DateField()),
+                output_field=DurationField()),
+        )
+
+    def get_conditional_queryset(self):
+        # 验证器只需项目本身的 updated_at，不带任务统计的聚合
+        return self.filter_queryset(Project.objects.all())
+
+    @action(detail=False)
+    def feed(self, request):
+        """Projects the current employee manages, sells, watches or has tasks on, read from ProjectMembership."""
+        memberships = ProjectMembership.objects.filter(employee_id=request.user.pk)
+        queryset = self.get_queryset().filter(pk__in=memberships.values('project_id')).prefetch_related(
+            Prefetch('memberships', queryset=memberships.only('project_id', 'role'), to_attr='my_memberships'))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
@@ -0,0 +1,125 @@
+from django.db.models import Count
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from Themis.feed import sync_dri_roles
+from Themis.models import Project, Task
+from Themis.pagination import KeysetPagination
+from Themis.serializers import TaskSerializer
+from Themis.signals import touch
+from Themis.views.mixins import BatchMixin, ConditionalGetMixin, ExportMixin, SerializerSizedQuerysetMixin
+
+
+def split_param(request, name):
+    value = request.query_params.get(name, '')
+    return [item for item in value.split(',') if item]
+
+
+def id_list(request, name):
+    try:
+        return [int(item) for item in split_param(request, name)]
+    except ValueError:
+        raise ValidationError({name: 'Must be a comma separated list of ids.'})
+
+
+class TaskViewSet(ConditionalGetMixin, ExportMixin, BatchMixin, SerializerSizedQuerysetMixin, viewsets.ModelViewSet):
+    """
+    Tasks filtered by ``project``, ``status``, ``priority`` and ``DRI`` (comma separated lists) and by
+    ``deadline_before``/``deadline_after``, for both the list and the export. The filter combinations are backed by
+    the composite indexes on ``Task``.
+    """
+    queryset = Task.objects.order_by('id')
+    serializer_class = TaskSerializer
+    pagination_class = KeysetPagination
+    export_name = 'tasks'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'export'):
+            return queryset
+        filters = {}
+        for name, lookup in (('project', 'project_id__in'), ('DRI', 'DRI_id__in')):
+            ids = id_list(self.request, name)
+            if ids:
+                filters[lookup] = ids
+        for name in ('status', 'priority'):
+            values = split_param(self.request, name)
+            if values:
+                filters[f'{name}__in'] = values
+        for name, lookup in (('deadline_before', 'deadline__lt'), ('deadline_after', 'deadline__gte')):
+            value = self.request.query_params.get(name)
+            if value:
+                try:
+                    parsed = parse_datetime(value)
+                except ValueError:
+                    # 格式正确但日期不存在，例如 13 月
+                    parsed = None
+                if parsed is None:
+                    raise ValidationError({name: 'Must be an ISO 8601 datetime.'})
+                filters[lookup] = parsed
+        return queryset.filter(**filters)
+
+    def batch_written(self, created, updated):
+        projects = {task.project_id for task in created}
+        for task, fields, previous in updated:
+            projects.update((task.project_id, previous.get('project')))
+        projects.discard(None)
+        sync_dri_roles(projects)
+        touch(Project.objects.filter(pk__in=projects))
+
+    @action(detail=False)
+    def rollup(self, request):
+        """Status and priority counts for every project in ``?project=1,2,3``, computed by a single GROUP BY."""
+        projects = id_list(request, 'project')
+        if not projects:
+            raise ValidationError({'project': 'This parameter is required.'})
+        rollup = {project: {
+            'total': 0,
+            'status': dict.fromkeys(Task.STATUS_CHOICES.values, 0),
+            'priority': dict.fromkeys(Task.PRIORITY_CHOICES.values, 0),
+        } for project in projects}
+        rows = Task.objects.filter(project_id__in=projects).order_by() \
+            .values_list('project_id', 'status', 'priority').annotate(count=Count('id'))
+        for project, task_status, priority, count in rows:
+            counts = rollup[project]
+            counts['total'] += count
+            counts['status'][task_status] = counts['status'].get(task_status, 0) + count
+            counts['priority'][priority] = counts['priority'].get(priority, 0) + count
+        return Response(rollup)
+
+    @action(detail=True)
+    def tree(self, request, pk=None):
+        """
+        The whole subtree of a task in one round trip. Every node carries ``total``/``completed`` counts of its
+        descendants and the latest deadline among them.
+        """
+        try:
+            root = int(pk)
+        except ValueError:
+            raise Http404
+        tasks = {task.pk: task for task in Task.subtree(root)}
+        if not tasks:
+            raise Http404
+        nodes = {task.pk: dict(data, children=[], total=0, completed=0, latest_deadline=None)
+                 for task, data in zip(tasks.values(), TaskSerializer(list(tasks.values()), many=True,
+                                                                      context={'request': request}).data)}
+        deadlines = {}
+        for task in sorted(tasks.values(), key=lambda task: (-task.depth, task.pk)):
+            if task.pk == root or task.parent_task_id not in nodes:
+                continue
+            node, parent = nodes[task.pk], nodes[task.parent_task_id]
+            parent['children'].append(node)
+            parent['total'] += node['total'] + 1
+            parent['completed'] += node['completed'] + (task.status == Task.STATUS_CHOICES.COMPLETED)
+            latest = max((d for d in (deadlines.get(task.pk), task.deadline, deadlines.get(task.parent_task_id))
+                          if d is not None), default=None)
+            if latest is not None:
+                deadlines[task.parent_task_id] = latest
+        to_representation = serializers.DateTimeField().to_representation
+        for task_id, latest in deadlines.items():
+            nodes[task_id]['latest_deadline'] = to_representation(latest)
+        return Response(nodes[root])
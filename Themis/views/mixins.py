@@ -0,0 +1,149 @@
+import hashlib
+import time
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max, Prefetch
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from Themis.batch import BATCH_MAX_ITEMS, write_batch
+from Themis.exports import export_response
+
+
+class SerializerSizedQuerysetMixin:
+    """
+    Sizes the read queryset to the serializer in use: every dotted ``source`` becomes a ``select_related`` join,
+    many-to-many fields are prefetched and only the columns that are actually rendered are selected, so the query
+    count per page stays constant and ``?fields=`` narrows the SELECT as well as the output.
+    """
+    sized_actions = ('list', 'retrieve')
+    # 需要裁剪列的预取关系，例如 {'watched_by': Employee.objects.only('id', 'name')}
+    prefetch_querysets = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.sized_actions:
+            return queryset
+        columns, related, prefetch = serializer_columns(queryset.model, self.get_serializer())
+        if prefetch:
+            queryset = queryset.prefetch_related(*(
+                Prefetch(name, queryset=self.prefetch_querysets[name]) if name in self.prefetch_querysets else name
+                for name in prefetch))
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+def serializer_columns(model, serializer):
+    """Returns the (only, select_related, prefetch_related) lookups needed to render ``serializer``."""
+    columns, related, prefetch = {model._meta.pk.name}, set(), set()
+    for field in serializer.fields.values():
+        if field.source == '*':
+            continue
+        if isinstance(field, (serializers.ManyRelatedField, serializers.ListSerializer)):
+            prefetch.add(field.source)
+            continue
+        path, current = [], model
+        for attr in field.source_attrs:
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                path = []
+                break
+            path.append(attr)
+            if not model_field.is_relation:
+                break
+            current = model_field.related_model
+            if len(path) < len(field.source_attrs):
+                related.add('__'.join(path))
+        if path:
+            columns.add('__'.join(path))
+    return columns, related, prefetch
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified for ``list`` and ``retrieve``, derived from ``max(updated_at)`` and the row count of the
+    filtered queryset with one aggregate query. A matching ``If-None-Match``/``If-Modified-Since`` is answered with
+    304 before the page is fetched or serialized.
+    """
+    conditional_actions = ('list', 'retrieve')
+    # 表示中含有随时间变化的值（如逾期任务数）时，验证器每隔该秒数失效一次
+    conditional_time_bucket = None
+
+    def get_conditional_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.get_conditional_queryset(), super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        queryset = self.get_conditional_queryset().filter(**{self.lookup_field: lookup})
+        return self.conditional(queryset, super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, queryset, handler, request, *args, **kwargs):
+        state = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('pk'))
+        if self.action == 'retrieve' and not state['count']:
+            return handler(request, *args, **kwargs)
+        etag, last_modified = self.validators(state['last'], state['count'])
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def validators(self, last, count):
+        last_modified = int(last.timestamp()) if last else None
+        parts = [type(self).__name__, self.action, str(count), last.isoformat() if last else '']
+        if self.conditional_time_bucket:
+            bucket = int(time.time()) // self.conditional_time_bucket * self.conditional_time_bucket
+            parts.append(str(bucket))
+            last_modified = max(last_modified or 0, bucket)
+        return f'"{hashlib.md5(":".join(parts).encode()).hexdigest()}"', last_modified
+
+
+class ExportMixin:
+    """
+    ``export.csv`` and ``export.xlsx`` actions streaming every row of the filtered queryset as export
+    ``export_name`` of ``Themis.exports``, without pagination and with flat memory use.
+    """
+    export_name = None
+
+    @action(detail=False, url_path=r'export\.(?P<file_format>csv|xlsx)')
+    def export(self, request, file_format):
+        return export_response(self.export_name, file_format, self.filter_queryset(self.get_queryset()),
+                               asynchronous=isinstance(request._request, ASGIRequest))
+
+
+class BatchMixin:
+    """
+    ``batch`` action: POST a list of objects to create them, PATCH a list of objects with ``id`` to update them, in
+    one request and one transaction (see ``Themis.batch.write_batch``). Invalid items are reported per item and the
+    rest are written, unless ``?atomic=true`` asks for all or nothing.
+    """
+
+    @action(detail=False, methods=['post', 'patch'])
+    def batch(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': ['Expected a non-empty list of objects.']})
+        if len(items) > BATCH_MAX_ITEMS:
+            raise ValidationError({'non_field_errors': [f'At most {BATCH_MAX_ITEMS} objects per batch.']})
+        results, status = write_batch(self.get_serializer_class(), items, self.get_serializer_context(),
+                                      partial=request.method == 'PATCH',
+                                      atomic=request.query_params.get('atomic') in ('1', 'true'),
+                                      after_write=self.batch_written)
+        return Response(results, status=status)
+
+    def batch_written(self, created, updated):
+        """Does the work of the post_save signals that ``bulk_create``/``bulk_update`` skip."""